@@ -0,0 +1,66 @@
+# Login cost of a large ledger: parsing the CSV snapshot against mapping the binary ledger
+# file, then what the first dashboard read, the first edit (which copies the mapped
+# columns out) and a full snapshot save cost on each.
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+import synthetic
+
+USER = "bench"
+
+
+def timed(func, repeat=1):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def opened(backend):
+    store = main.STORAGE_BACKENDS[backend](USER)
+    store.load()
+    return store
+
+
+def run(rows, repeat):
+    workdir = tempfile.mkdtemp(prefix="exchequer-bench-")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        fields = next(synthetic.expenses(1, seed=7))
+        fields = {key: value for key, value in fields.items() if key != 'id'}
+        store = synthetic.seed_store(main.CsvLedgerStore(USER), rows)
+        # The binary store reads the CSV snapshot once and writes its ledger file on save.
+        opened("binary").save()
+        print(f"rows: {rows:,}, csv {os.path.getsize(store.csv_file) / 2 ** 20:.0f} MB, "
+              f"ledger file {os.path.getsize(f'expenses_{USER}.ledger') / 2 ** 20:.0f} MB")
+
+        for backend, runs in (("csv", 1), ("binary", repeat)):
+            load, store = timed(lambda: opened(backend), runs)
+            dashboard, _ = timed(lambda: (store.expense_total(), store.category_totals(),
+                                          store.month_category_matrix().window(main.TREND_MONTHS)))
+            edit, _ = timed(lambda: store.add_expense(fields))
+            save, _ = timed(store.save)
+            print(f"{backend:>7}: open {load * 1000:10.2f} ms, dashboard {dashboard * 1000:8.2f} ms, "
+                  f"first add {edit * 1000:8.2f} ms, save {save * 1000:10.1f} ms")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CSV parse vs mapped binary ledger open benchmark")
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run(args.rows, args.repeat)
@@ -0,0 +1,93 @@
+# Chart refresh cost per mutation: the old clear-and-redraw chart update against
+# StatsCharts with the Statistics screen shown and hidden. Needs a display and matplotlib.
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tkinter as tk
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+import synthetic
+
+USER = "bench"
+
+
+def legacy_refresh(fig, ax1, ax2, canvas, store, colors):
+    ax1.clear()
+    ax2.clear()
+    cat_totals = store.category_totals()
+    categories = list(cat_totals.keys())
+    cmap = main.load_matplotlib().colormaps["viridis"]
+    ax1.pie(list(cat_totals.values()), labels=categories, autopct="%1.1f%%", startangle=90,
+            colors=cmap([i / float(len(categories)) for i in range(len(categories))]),
+            textprops={'color': colors["text"], 'fontsize': 8})
+    ax1.set_title("Expenses by Category", color=colors["text"], fontsize=10)
+    sip_totals = {}
+    for sip in store.sips:
+        sip_totals[sip['category']] = sip_totals.get(sip['category'], 0) + sip['amount']
+    ax2.bar(list(sip_totals), list(sip_totals.values()), color=colors["accent"])
+    ax2.set_title("SIP by Category", color=colors["text"], fontsize=10)
+    fig.tight_layout()
+    canvas.draw()
+
+
+def per_mutation(root, store, refresh, mutations):
+    fields = next(synthetic.expenses(1, seed=7))
+    start = time.perf_counter()
+    for _ in range(mutations):
+        store.add_expense({key: value for key, value in fields.items() if key != 'id'})
+        refresh()
+        root.update()
+    return (time.perf_counter() - start) / mutations
+
+
+def run(rows, mutations):
+    workdir = tempfile.mkdtemp(prefix="exchequer-bench-")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        root = tk.Tk()
+        app = main.ModernExpenseTracker(root, prewarm=False)
+        app.current_user = USER
+        app.initialize_user_data(lambda: None)
+        app.io.flush()
+        store = synthetic.seed_store(app.user_data[USER]['store'], rows, sips=50)
+        app.open_session()
+        app.show_frame("stats")
+        root.update()
+
+        shown = per_mutation(root, store, lambda: app.refresh.mark("charts"), mutations)
+        app.show_frame("main")
+        hidden = per_mutation(root, store, lambda: app.refresh.mark("charts"), mutations)
+        revisit = per_mutation(root, store, lambda: app.show_frame("stats"), 1)
+
+        mpl = main.load_matplotlib()
+        window = tk.Toplevel(root)
+        fig = mpl.Figure(figsize=(8, 4))
+        ax1, ax2 = fig.subplots(1, 2)
+        canvas = mpl.FigureCanvasTkAgg(fig, master=window)
+        canvas.get_tk_widget().pack(fill="both", expand=True)
+        legacy = per_mutation(root, store, lambda: legacy_refresh(fig, ax1, ax2, canvas, store, app.colors),
+                              mutations)
+        app.on_close()
+
+        print(f"rows: {rows:,}, mutations: {mutations}")
+        print(f"legacy clear-and-redraw:     {legacy * 1000:8.2f} ms/mutation")
+        print(f"artist reuse, screen shown:  {shown * 1000:8.2f} ms/mutation")
+        print(f"screen hidden:               {hidden * 1000:8.2f} ms/mutation")
+        print(f"revisit after hidden edits:  {revisit * 1000:8.2f} ms")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Statistics chart refresh benchmark")
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--mutations", type=int, default=50)
+    args = parser.parse_args()
+    run(args.rows, args.mutations)
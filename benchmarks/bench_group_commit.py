@@ -0,0 +1,86 @@
+# Persistence under a scripted burst of adds: the original rewrite of the whole CSV on every
+# mutation, a journal commit (append + fsync) per add, and group commit on the I/O worker,
+# where adds staged within COMMIT_WINDOW_MS share one append and one fsync. Times run until
+# the last add is on disk.
+import argparse
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+import synthetic
+
+
+class Headless:
+    # IOWorker only needs after() to schedule polling for its results.
+    def after(self, ms, callback):
+        return None
+
+
+def rewrite_per_add(rows, fields, adds, path):
+    ledger = list(rows)
+    for _ in range(adds):
+        ledger.append(dict(fields, id=len(ledger) + 1))
+        with open(path, mode='w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=main.EXPENSE_FIELDS)
+            writer.writeheader()
+            writer.writerows(ledger)
+    return adds
+
+
+def burst(username, rows, fields, adds, io):
+    store = synthetic.seed_store(main.CsvLedgerStore(username, io=io), rows)
+    if io is not None:
+        io.flush()
+    commits = store.commits
+    start = time.perf_counter()
+    for _ in range(adds):
+        store.add_expense(fields)
+    if io is not None:
+        io.flush()
+    return time.perf_counter() - start, store.commits - commits
+
+
+def report(label, adds, seconds, commits):
+    print(f"{label:24} {adds:7,} adds {seconds:9.2f} s {adds / seconds:10,.0f} adds/s "
+          f"{commits:7,} commits {commits / seconds:8,.0f} commits/s")
+
+
+def run(rows, adds, legacy_adds):
+    workdir = tempfile.mkdtemp(prefix="exchequer-bench-")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        ledger = list(synthetic.expenses(rows))
+        fields = {key: value for key, value in ledger[0].items() if key != 'id'}
+        print(f"ledger: {rows:,} rows, commit window: {main.COMMIT_WINDOW_MS} ms")
+
+        start = time.perf_counter()
+        rewrite_per_add(ledger, fields, legacy_adds, "legacy.csv")
+        report("rewrite csv per add", legacy_adds, time.perf_counter() - start, legacy_adds)
+
+        report("journal commit per add", adds, *burst("single", ledger, fields, adds, None))
+
+        io = main.IOWorker(Headless())
+        try:
+            report("group commit", adds, *burst("grouped", ledger, fields, adds, io))
+        finally:
+            io.stop()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Group commit persistence benchmark")
+    parser.add_argument("--rows", type=int, default=10_000, help="expenses already in the ledger")
+    parser.add_argument("--adds", type=int, default=10_000)
+    parser.add_argument("--legacy-adds", type=int, default=500,
+                        help="adds to run through the rewrite-per-add baseline, which is quadratic")
+    args = parser.parse_args()
+    run(args.rows, args.adds, args.legacy_adds)
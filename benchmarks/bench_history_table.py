@@ -0,0 +1,79 @@
+# Times an Expense History refresh at growing ledger sizes: the old clear-and-insert-
+# everything Treeview against VirtualTreeview. Needs a display for Tk.
+import argparse
+import os
+import sys
+import time
+import tkinter as tk
+from tkinter import ttk
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+import synthetic
+
+COLUMNS = ("ID", "Date", "Category", "Amount", "Description")
+
+
+def format_row(exp):
+    return (exp['id'], exp['date'], exp['category'], f"₹{exp['amount']:.2f}", exp['description'])
+
+
+def legacy_refresh(tree, index):
+    for item in tree.get_children():
+        tree.delete(item)
+    for exp in index.newest_first():
+        tree.insert("", "end", values=format_row(exp))
+
+
+def virtual_refresh(table, index):
+    table.set_source(index.newest_first(), index.count())
+
+
+def best_of(repeat, func, root):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        root.update_idletasks()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(sizes, legacy_max, repeat):
+    root = tk.Tk()
+    root.geometry("1000x600")
+    frame = tk.Frame(root)
+    frame.pack(fill="both", expand=True)
+    legacy_tree = ttk.Treeview(frame, columns=COLUMNS, show="headings")
+    legacy_tree.pack(side="left", fill="both", expand=True)
+    virtual_tree = ttk.Treeview(frame, columns=COLUMNS, show="headings")
+    virtual_tree.pack(side="left", fill="both", expand=True)
+    scrollbar = ttk.Scrollbar(frame, orient="vertical")
+    scrollbar.pack(side="right", fill="y")
+    table = main.VirtualTreeview(virtual_tree, scrollbar, format_row)
+    root.update()
+
+    print(f"{'rows':>10} {'legacy (ms)':>12} {'virtual (ms)':>13} {'scroll (ms)':>12}")
+    for size in sizes:
+        index = main.ExpenseDateIndex(main.ExpenseLedger(synthetic.expenses(size)))
+        legacy = None
+        if size <= legacy_max:
+            legacy = best_of(repeat, lambda: legacy_refresh(legacy_tree, index), root)
+            legacy_refresh(legacy_tree, main.ExpenseDateIndex(main.ExpenseLedger()))
+        virtual = best_of(repeat, lambda: virtual_refresh(table, index), root)
+        scroll = best_of(repeat, lambda: table.yview("moveto", "0.5"), root)
+        legacy_text = f"{legacy * 1000:12.1f}" if legacy is not None else f"{'skipped':>12}"
+        print(f"{size:>10} {legacy_text} {virtual * 1000:13.2f} {scroll * 1000:12.2f}")
+    root.destroy()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Expense History refresh benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 50_000, 200_000])
+    parser.add_argument("--legacy-max", type=int, default=50_000,
+                        help="largest ledger to time with the old full-insert refresh")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.sizes, args.legacy_max, args.repeat)
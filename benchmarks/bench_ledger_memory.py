@@ -0,0 +1,65 @@
+# Compares the memory held by one user's expenses as the old list of csv.DictReader dicts
+# against ExpenseLedger. Rows go through a CSV round trip first so both layouts hold the
+# same per-row strings load_user_data would produce.
+import argparse
+import csv
+import gc
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+import synthetic
+
+
+def csv_text(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=['id', 'date', 'category', 'amount', 'description'])
+    writer.writeheader()
+    writer.writerows(synthetic.expenses(rows))
+    return buffer.getvalue()
+
+
+def load_dicts(text):
+    expenses = []
+    for row in csv.DictReader(io.StringIO(text)):
+        row['amount'] = float(row['amount'])
+        row['id'] = int(row['id'])
+        expenses.append(row)
+    return expenses
+
+
+def load_ledger(text):
+    return main.ExpenseLedger(csv.DictReader(io.StringIO(text)))
+
+
+def measure(loader, text):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    expenses = loader(text)
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del expenses
+    return current, peak, elapsed
+
+
+def run(rows):
+    text = csv_text(rows)
+    print(f"{rows:,} expenses")
+    print(f"{'layout':>14} {'retained MB':>12} {'peak MB':>9} {'bytes/row':>10} {'load s':>8}")
+    for name, loader in (("list of dicts", load_dicts), ("ExpenseLedger", load_ledger)):
+        current, peak, elapsed = measure(loader, text)
+        print(f"{name:>14} {current / 2**20:12.1f} {peak / 2**20:9.1f} {current / rows:10.1f} {elapsed:8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Expense ledger memory benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+    run(args.rows)
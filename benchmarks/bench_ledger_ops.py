@@ -0,0 +1,161 @@
+# Times the core ledger operations headlessly on seeded synthetic ledgers of growing size,
+# for each storage backend, and writes the results as JSON so runs from different versions
+# can be compared. Peak memory comes from a second, tracemalloc-traced run of each
+# operation, so tracing overhead never lands in the timings.
+import argparse
+import gc
+import itertools
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+import synthetic
+from bench_startup import revision
+
+USER = "bench"
+SIPS_PER_LEDGER = 200
+PAGE = 100
+YEAR = 2020
+
+
+class Context:
+    def __init__(self, backend, rows, workdir):
+        self.backend = backend
+        self.rows = rows
+        self.workdir = workdir
+        self.source = os.path.join(workdir, "source.csv")
+        self.export = os.path.join(workdir, "export.csv")
+        self.store = None
+
+
+def op_import(ctx):
+    imported, _ = main.LedgerEngine(ctx.backend).ingest(USER, [ctx.source], merge=False)
+    return imported
+
+
+def op_load(ctx):
+    if ctx.store is not None:
+        ctx.store.close()
+    ctx.store = main.STORAGE_BACKENDS[ctx.backend](USER)
+    ctx.store.load()
+    return ctx.store.expense_count()
+
+
+def op_dashboard(ctx):
+    store = ctx.store
+    store.expense_total()
+    store.latest_expense()
+    store.category_totals()
+    store.month_total(f"{YEAR}-06")
+    store.day_total(f"{YEAR}-06-15")
+    return ctx.rows
+
+
+def history(year=None, month=None, search=""):
+    def op(ctx):
+        # Only the first visible page is consumed, as the history table does.
+        rows, _ = ctx.store.query_expenses(year=year, month=month, search=search)
+        list(itertools.islice(rows, PAGE))
+        return ctx.rows
+    return op
+
+
+def op_export(ctx):
+    expenses, sips = ctx.store.export_rows()
+    synthetic.write_export(ctx.export, expenses, sips)
+    return ctx.rows
+
+
+def op_save(ctx):
+    ctx.store.set_goals(synthetic.goals())
+    ctx.store.save()
+    return ctx.rows
+
+
+OPERATIONS = [
+    ("import", op_import),
+    ("load", op_load),
+    ("dashboard", op_dashboard),
+    ("history_all", history()),
+    ("history_year", history(year=YEAR)),
+    ("history_month", history(year=YEAR, month=6)),
+    ("history_search", history(search="coffee lu")),
+    ("export", op_export),
+    ("save", op_save)
+]
+
+
+def timed(op, ctx):
+    gc.collect()
+    start = time.perf_counter()
+    rows = op(ctx)
+    return time.perf_counter() - start, rows
+
+
+def traced_peak(op, ctx):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        op(ctx)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_size(backend, rows, memory):
+    workdir = tempfile.mkdtemp(prefix="exchequer-bench-")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    ctx = Context(backend, rows, workdir)
+    results = []
+    try:
+        synthetic.write_export(ctx.source, synthetic.expenses(rows), synthetic.sips(SIPS_PER_LEDGER))
+        for name, op in OPERATIONS:
+            seconds, processed = timed(op, ctx)
+            peak = traced_peak(op, ctx) if memory else None
+            throughput = processed / seconds if seconds else 0.0
+            results.append({
+                "backend": backend, "rows": rows, "operation": name, "seconds": seconds,
+                "rows_per_second": throughput, "peak_bytes": peak
+            })
+            peak_text = f"{peak / 2 ** 20:10.1f}" if peak is not None else f"{'-':>10}"
+            print(f"{backend:>7} {rows:>10,} {name:>15} {seconds * 1000:12.2f} {throughput:>14,.0f} {peak_text}",
+                  flush=True)
+    finally:
+        if ctx.store is not None:
+            ctx.store.close()
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def run(sizes, backends, memory, output):
+    report = {"revision": revision(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "python": platform.python_version(), "machine": platform.machine(), "results": []}
+    print(f"{'backend':>7} {'rows':>10} {'operation':>15} {'time (ms)':>12} {'rows/s':>14} {'peak (MB)':>10}")
+    for rows in sizes:
+        for backend in backends:
+            report["results"].extend(run_size(backend, rows, memory))
+    with open(output, mode='w') as file:
+        json.dump(report, file, indent=2)
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Core ledger operation benchmark suite")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000],
+                        help="ledger sizes to run; add 10000000 for the full suite")
+    parser.add_argument("--backends", nargs="+", choices=sorted(main.STORAGE_BACKENDS),
+                        default=sorted(main.STORAGE_BACKENDS))
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced peak-memory runs")
+    parser.add_argument("--output", default="ledger_ops.json")
+    args = parser.parse_args()
+    run(args.sizes, args.backends, not args.no_memory, os.path.abspath(args.output))
@@ -0,0 +1,95 @@
+# Times login-to-dashboard and a theme toggle with screens built lazily, against building
+# every screen up front as login used to, and the in-place restyle against the old
+# destroy-and-recreate theme switch. Needs a display for Tk.
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tkinter as tk
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+import synthetic
+
+USER = "bench"
+
+
+def login(app):
+    app.current_user = USER
+    app.initialize_user_data(lambda: None)
+    app.io.flush()
+    start = time.perf_counter()
+    app.open_session()
+    app.root.update_idletasks()
+    return time.perf_counter() - start
+
+
+def timed(root, func):
+    start = time.perf_counter()
+    func()
+    root.update_idletasks()
+    return time.perf_counter() - start
+
+
+def toggle_theme(app):
+    app.theme_var.set("Light" if app.current_theme == "dark" else "Dark")
+    app.change_theme()
+
+
+def legacy_toggle_theme(app):
+    # The old change_theme: destroy the nav bar and every screen, then build them all again
+    # in the new palette, charts included.
+    app.current_theme = "light" if app.current_theme == "dark" else "dark"
+    app.theme_var.set(app.current_theme.title())
+    app.colors = app.themes[app.current_theme]
+    app.root.configure(bg=app.colors["background"])
+    current = app.current_screen
+    app.nav_frame.destroy()
+    for frame in app.frames.values():
+        frame.destroy()
+    app.frames = {}
+    app.update_treeview_style()
+    app.update_chart_style()
+    app.create_nav_bar()
+    for name in app.screens:
+        app.show_frame(name)
+    app.show_frame(current)
+
+
+def run(rows):
+    workdir = tempfile.mkdtemp(prefix="exchequer-bench-")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        synthetic.seed_store(main.CsvLedgerStore(USER), rows, sips=50)
+        root = tk.Tk()
+        app = main.ModernExpenseTracker(root)
+        root.update()
+
+        lazy_login = login(app)
+        app.show_frame("settings")
+        lazy_toggle = timed(root, lambda: toggle_theme(app))
+        eager_build = timed(root, lambda: [app.show_frame(name) for name in app.screens])
+        full_toggle = timed(root, lambda: toggle_theme(app))
+        legacy_toggle = timed(root, lambda: legacy_toggle_theme(app))
+        app.on_close()
+
+        print(f"rows: {rows:,}")
+        print(f"login to dashboard (lazy):      {lazy_login * 1000:8.1f} ms")
+        print(f"login + every screen (eager):   {(lazy_login + eager_build) * 1000:8.1f} ms")
+        print(f"theme toggle, two screens:      {lazy_toggle * 1000:8.1f} ms")
+        print(f"theme toggle, every screen:     {full_toggle * 1000:8.1f} ms")
+        print(f"legacy destroy-and-recreate:    {legacy_toggle * 1000:8.1f} ms")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Screen construction and theme switch benchmark")
+    parser.add_argument("--rows", type=int, default=50_000)
+    args = parser.parse_args()
+    run(args.rows)
@@ -0,0 +1,61 @@
+# SIP projection cost: the vectorized project_sips against walking every installment of
+# every SIP in Python, for the full monthly horizon and both assumed rates. Needs numpy.
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+import synthetic
+
+
+def per_installment(sips, today, years=main.SIP_PROJECTION_YEARS, rates=main.SIP_PROJECTION_RATES):
+    horizon = 12 * years
+    values = [[0.0] * (horizon + 1) for _ in rates]
+    invested = [0.0] * (horizon + 1)
+    for sip in sips:
+        start = main.parse_date(sip['start_date'])
+        step = 12 // main.SIP_PERIODS_PER_YEAR[sip['frequency']]
+        offset = (start.year - today.year) * 12 + start.month - today.month + (start.day - today.day) / 31
+        while offset <= horizon:
+            for month in range(max(0, int(offset + 0.999999)), horizon + 1):
+                invested[month] += sip['amount']
+                for values_at, rate in zip(values, rates):
+                    values_at[month] += sip['amount'] * (1 + rate) ** ((month - offset) / 12)
+            offset += step
+    return invested, values
+
+
+def best(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run(counts, repeat, baseline_max):
+    today = date.today()
+    main.load_numpy()
+    for count in counts:
+        sips = list(synthetic.sips(count))
+        vectorized = best(lambda: main.project_sips(sips, today=today), repeat)
+        line = f"{count:6,} SIPs: vectorized {vectorized * 1000:9.2f} ms"
+        if count <= baseline_max:
+            loop = best(lambda: per_installment(sips, today), 1)
+            line += f", per-installment loop {loop * 1000:10.1f} ms ({loop / vectorized:,.0f}x)"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SIP projection benchmark")
+    parser.add_argument("--counts", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline-max", type=int, default=100,
+                        help="largest portfolio to also run through the Python loop")
+    args = parser.parse_args()
+    run(args.counts, args.repeat, args.baseline_max)
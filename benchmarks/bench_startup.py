@@ -0,0 +1,84 @@
+# Measures cold-start import cost with `python -X importtime`: `import main` (what the
+# login screen waits for) and the deferred matplotlib load the first chart pays for.
+# --record appends one JSON line per run so numbers can be compared across releases.
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    "startup": "import main",
+    "first_chart": "import main; main.load_matplotlib()"
+}
+
+
+def importtime(code):
+    # Returns {module: (self_us, cumulative_us)} for one fresh interpreter.
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            cwd=REPO, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def best_of(repeat, code):
+    # Per-module minimum over fresh interpreters filters out disk-cache noise.
+    best = {}
+    for _ in range(repeat):
+        for name, (self_us, cumulative_us) in importtime(code).items():
+            previous = best.get(name)
+            if previous is None or cumulative_us < previous[1]:
+                best[name] = (self_us, cumulative_us)
+    return best
+
+
+def revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(repeat, top, record):
+    entry = {"revision": revision(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+             "python": platform.python_version(), "scenarios": {}}
+    for scenario, code in SCENARIOS.items():
+        try:
+            modules = best_of(repeat, code)
+        except RuntimeError as e:
+            print(f"{scenario}: skipped ({e})")
+            continue
+        total = sum(self_us for self_us, _ in modules.values())
+        heaviest = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)[:top]
+        entry["scenarios"][scenario] = {
+            "total_us": total,
+            "modules": len(modules),
+            "heaviest": {name: cumulative_us for name, (_, cumulative_us) in heaviest}
+        }
+        print(f"{scenario}: {total / 1000:.1f} ms across {len(modules)} modules")
+        for name, (_, cumulative_us) in heaviest:
+            print(f"    {cumulative_us / 1000:9.1f} ms  {name}")
+    if record:
+        with open(record, mode='a') as file:
+            file.write(json.dumps(entry) + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Startup import-time benchmark")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="heaviest imports to list per scenario")
+    parser.add_argument("--record", help="append the results as a JSON line to this file")
+    args = parser.parse_args()
+    run(args.repeat, args.top, args.record)
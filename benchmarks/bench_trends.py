@@ -0,0 +1,70 @@
+# Cost of the data behind the 10-year trend charts: reading the materialized month x
+# category matrix against regrouping every expense, plus the per-mutation upkeep the
+# matrix adds to add and delete.
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+import synthetic
+
+USER = "bench"
+
+
+def regroup(store, count):
+    totals = {}
+    for exp in store.iter_expenses():
+        key = (exp['date'][:7], exp['category'])
+        totals[key] = totals.get(key, 0.0) + exp['amount']
+    months = sorted({month for month, _ in totals})[-count:]
+    categories = sorted({category for _, category in totals})
+    return months, {category: [totals.get((month, category), 0.0) for month in months] for category in categories}
+
+
+def timed(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(rows, backends, mutations):
+    workdir = tempfile.mkdtemp(prefix="exchequer-bench-")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        fields = next(synthetic.expenses(1, seed=7))
+        fields = {key: value for key, value in fields.items() if key != 'id'}
+        print(f"rows: {rows:,}, window: {main.TREND_MONTHS} months")
+        for backend in backends:
+            store = synthetic.seed_store(main.STORAGE_BACKENDS[backend](f"{USER}_{backend}"), rows)
+            matrix = timed(lambda: store.month_category_matrix().window(main.TREND_MONTHS))
+            raw = timed(lambda: regroup(store, main.TREND_MONTHS), repeat=1)
+            start = time.perf_counter()
+            for _ in range(mutations):
+                store.remove_expenses([store.add_expense(fields)['id']])
+            churn = (time.perf_counter() - start) / mutations
+            store.close()
+            print(f"{backend:>7}: matrix window {matrix * 1000:9.2f} ms, regroup expenses {raw * 1000:10.1f} ms, "
+                  f"add+delete {churn * 1000:.3f} ms")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Month x category trend data benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--backends", nargs="+", choices=sorted(main.STORAGE_BACKENDS),
+                        default=sorted(main.STORAGE_BACKENDS))
+    parser.add_argument("--mutations", type=int, default=200)
+    args = parser.parse_args()
+    run(args.rows, args.backends, args.mutations)
@@ -0,0 +1,73 @@
+# Account switching on a shared machine: cycles logins through more users than the cache
+# budget holds and reports re-login time for cached and evicted users, plus the resident
+# ledger size the cache settles at.
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+import synthetic
+
+
+def login(cache, username):
+    # What initialize_user_data does, minus Tk.
+    start = time.perf_counter()
+    hit = username in cache and cache[username]['store'].is_current()
+    if username in cache:
+        cache.touch(username)
+    else:
+        cache[username] = {'store': main.CsvLedgerStore(username), 'monthly_budget': 0.0, 'daily_budget': 0.0}
+    if not hit:
+        cache[username]['store'].load()
+    cache.trim(keep=username)
+    return hit, time.perf_counter() - start
+
+
+def run(users, rows, budget_mb, rounds):
+    workdir = tempfile.mkdtemp(prefix="exchequer-bench-")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        names = [f"user{number:03d}" for number in range(users)]
+        for seed, username in enumerate(names):
+            synthetic.seed_store(main.CsvLedgerStore(username), rows, seed=seed).close()
+
+        cache = main.UserLedgerCache(budget_mb << 20)
+        times = {True: [], False: []}
+        peak = 0
+        # Mostly the two most recent users, with a full sweep every round.
+        order = []
+        for _ in range(rounds):
+            order.extend(names)
+            order.extend(names[-2:] * 3)
+        for username in order:
+            hit, seconds = login(cache, username)
+            times[hit].append(seconds)
+            peak = max(peak, cache.nbytes())
+            cache[username]['store'].close()
+            cache.trim()
+        cache.close()
+
+        print(f"users: {users}, rows each: {rows:,}, budget: {budget_mb} MB")
+        for hit, label in ((True, "cached re-login"), (False, "cold login")):
+            if times[hit]:
+                print(f"{label:16} {len(times[hit]):4} logins, {sum(times[hit]) / len(times[hit]) * 1000:9.2f} ms mean")
+        print(f"evictions: {cache.evictions}, peak resident: {peak / 2 ** 20:.1f} MB")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-user ledger cache benchmark")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--budget-mb", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    run(args.users, args.rows, args.budget_mb, args.rounds)
@@ -0,0 +1,90 @@
+# Login and signup cost against a large users.csv: the linear csv.DictReader scan login
+# and signup used to do on every attempt, against UserDirectory's indexed lookups.
+import argparse
+import csv
+import os
+import shutil
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+import synthetic
+
+
+def legacy_login(path, username, password):
+    with open(path, mode='r', newline='') as file:
+        for row in csv.DictReader(file):
+            if row['username'] == username and row['password'] == password:
+                return True
+    return False
+
+
+def legacy_signup(path, username, password):
+    with open(path, mode='r', newline='') as file:
+        for row in csv.DictReader(file):
+            if row['username'] == username:
+                return False
+    with open(path, mode='a', newline='') as file:
+        csv.DictWriter(file, fieldnames=['username', 'password']).writerow(
+            {'username': username, 'password': password})
+    return True
+
+
+def per_call(func, calls):
+    start = time.perf_counter()
+    for args in calls:
+        func(*args)
+    return (time.perf_counter() - start) / len(calls)
+
+
+def run(count, attempts):
+    workdir = tempfile.mkdtemp(prefix="exchequer-bench-")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        users = list(synthetic.users(count))
+        with open("users.csv", mode='w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=['username', 'password'])
+            writer.writeheader()
+            writer.writerows(users)
+        rng = random.Random(0)
+        logins = [(user['username'], user['password']) for user in rng.sample(users, attempts)]
+        signups = [(f"new{number:06d}", user['password']) for number, user in enumerate(users[:attempts])]
+
+        legacy_logins = per_call(lambda username, password: legacy_login("users.csv", username, password), logins)
+        legacy_signups = per_call(lambda username, password: legacy_signup("users.csv", username, password), signups)
+
+        directory = main.UserDirectory("users.csv")
+        start = time.perf_counter()
+        len(directory)
+        first_load = time.perf_counter() - start
+        indexed_logins = per_call(directory.verify, logins)
+        indexed_signups = per_call(lambda username, password: f"x{username}" in directory or directory.add(
+            f"x{username}", password), signups)
+        os.utime("users.csv")
+        reload_start = time.perf_counter()
+        len(directory)
+        reload = time.perf_counter() - reload_start
+
+        print(f"users: {count:,}, attempts: {attempts}")
+        print(f"legacy scan login:          {legacy_logins * 1000:9.3f} ms")
+        print(f"legacy scan signup:         {legacy_signups * 1000:9.3f} ms")
+        print(f"index load (first login):   {first_load * 1000:9.3f} ms")
+        print(f"indexed login:              {indexed_logins * 1000:9.3f} ms")
+        print(f"indexed signup:             {indexed_signups * 1000:9.3f} ms")
+        print(f"reload after outside edit:  {reload * 1000:9.3f} ms")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="User directory login/signup benchmark")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--attempts", type=int, default=50)
+    args = parser.parse_args()
+    run(args.users, args.attempts)
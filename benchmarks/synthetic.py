@@ -0,0 +1,73 @@
+import csv
+import random
+from datetime import date, timedelta
+
+CATEGORIES = ["Food", "Transport", "Shopping", "Bills", "Entertainment", "Health", "Education", "Other"]
+SIP_CATEGORIES = ["Mutual Fund", "Stocks", "ETF", "Fixed Deposit", "Other"]
+FREQUENCIES = ["Monthly", "Quarterly", "Yearly"]
+WORDS = ["coffee", "lunch", "groceries", "metro", "cab", "rent", "electricity", "movie",
+         "books", "course", "pharmacy", "gym", "shoes", "gift", "internet", "fuel"]
+
+
+def expenses(count, seed=0, start=date(2015, 1, 1), days=3650):
+    rng = random.Random(seed)
+    for expense_id in range(1, count + 1):
+        yield {
+            'id': expense_id,
+            'date': (start + timedelta(days=rng.randrange(days))).isoformat(),
+            'category': rng.choice(CATEGORIES),
+            'amount': round(rng.uniform(10, 5000), 2),
+            'description': f"{rng.choice(WORDS)} {rng.choice(WORDS)}"
+        }
+
+
+def sips(count, seed=0, start=date(2015, 1, 1), days=3650):
+    rng = random.Random(seed)
+    for sip_id in range(1, count + 1):
+        yield {
+            'id': sip_id,
+            'name': f"{rng.choice(WORDS).title()} Fund",
+            'amount': float(rng.choice([500, 1000, 2500, 5000, 10000])),
+            'category': rng.choice(SIP_CATEGORIES),
+            'frequency': rng.choice(FREQUENCIES),
+            'start_date': (start + timedelta(days=rng.randrange(days))).isoformat()
+        }
+
+
+_sips = sips
+
+
+def seed_store(store, rows, sips=0, seed=0):
+    # Loads the store and replaces its ledger with `rows` expenses, either a count of synthetic
+    # ones or prebuilt rows, plus `sips` synthetic SIPs.
+    if isinstance(rows, int):
+        rows = expenses(rows, seed=seed)
+    store.load()
+    store.begin_import(merge=False)
+    store.import_rows([dict(row) for row in rows], list(_sips(sips, seed=seed)), remap=False)
+    store.finish_import()
+    return store
+
+
+def users(count, seed=0):
+    rng = random.Random(seed)
+    for number in range(1, count + 1):
+        yield {'username': f"user{number:06d}", 'password': f"{rng.getrandbits(256):064x}"}
+
+
+def goals(seed=0):
+    rng = random.Random(seed)
+    return {category: float(rng.choice([2000, 5000, 10000, 20000])) for category in CATEGORIES}
+
+
+def write_export(path, expense_rows, sip_rows=()):
+    # Writes the CSV layout export_data produces and import_data reads.
+    with open(path, mode='w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(["Type", "ID", "Date", "Category", "Amount", "Description", "Frequency"])
+        for exp in expense_rows:
+            writer.writerow(["Expense", exp['id'], exp['date'], exp['category'], exp['amount'],
+                             exp['description'], ""])
+        for sip in sip_rows:
+            writer.writerow(["SIP", sip['id'], sip['start_date'], sip['category'], sip['amount'],
+                             sip['name'], sip['frequency']])
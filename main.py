@@ -2,13 +2,2721 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import csv
 import os
-from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from datetime import datetime, date, timedelta
 import hashlib
+import sys
+import json
+import math
+import queue
+import threading
+import types
+import sqlite3
+import argparse
+import bisect
+import mmap
+import itertools
+import re
+import time
+import logging
+import logging.handlers
+import traceback
+from collections import deque, OrderedDict
+from array import array
+
+# Journal entries are folded back into the CSV snapshots once they outnumber the
+# rows already in the ledger, so compaction stays amortised O(1) per mutation.
+JOURNAL_COMPACT_MIN = 500
+# Mutations staged within this long of the first one are written and fsynced together.
+COMMIT_WINDOW_MS = 25
+SEARCH_DEBOUNCE_MS = 250
+SQLITE_DB_FILE = "exchequer.db"
+EXPENSE_FIELDS = ['id', 'date', 'category', 'amount', 'description']
+# Binary ledger files: magic, header length, JSON header, then the 8-byte aligned columns.
+LEDGER_MAGIC = b"EXQLEDG1"
+LEDGER_COLUMNS = ['q', 'i', 'H', 'd', 'I', 'B', 'q', 'B']
+SIP_FIELDS = ['id', 'name', 'amount', 'category', 'frequency', 'start_date']
+IMPORT_BATCH_ROWS = 5000
+IMPORT_QUEUE_BATCHES = 4
+IMPORT_POLL_MS = 50
+IMPORT_BAD_ROWS_SHOWN = 3
+IO_POLL_MS = 50
+# Instrumentation is off unless --profile is given or it is switched on in Settings.
+PROFILE_LOG_FILE = "exchequer-perf.log"
+PROFILE_LOG_BYTES = 1 << 20
+PROFILE_LOG_BACKUPS = 3
+PROFILE_SAMPLES = 512
+STALL_THRESHOLD_S = 2.0
+STALL_BEAT_MS = 100
+STALL_LOG_FILE = "exchequer-stalls.log"
+# Ledgers of recently logged-out users stay resident up to this many bytes.
+USER_CACHE_BYTES = 256 << 20
+SIP_PERIODS_PER_YEAR = {"Monthly": 12, "Quarterly": 4, "Yearly": 1}
+# Assumed annual returns and horizon for the Statistics SIP projection.
+SIP_PROJECTION_RATES = (0.08, 0.12)
+SIP_PROJECTION_YEARS = 20
+TREND_MONTHS = 120
+ALERT_DISMISS_MS = 10000
+
+
+_matplotlib = None
+_matplotlib_lock = threading.Lock()
+
+
+def load_matplotlib():
+    # matplotlib (and numpy under it) costs more to import than the rest of startup, so it
+    # is loaded on the first chart, or ahead of time by the pre-warm thread. pyplot is
+    # never imported: the app embeds Figure directly and needs no global figure manager.
+    global _matplotlib
+    with _matplotlib_lock:
+        if _matplotlib is None:
+            import matplotlib
+            import matplotlib.style
+            from matplotlib.figure import Figure
+            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+            _matplotlib = types.SimpleNamespace(
+                Figure=Figure, FigureCanvasTkAgg=FigureCanvasTkAgg, colormaps=matplotlib.colormaps,
+                rcParams=matplotlib.rcParams, style=matplotlib.style)
+    return _matplotlib
+
+
+_numpy = None
+_numpy_lock = threading.Lock()
+
+
+def load_numpy():
+    # Only the SIP projection needs numpy, so it is imported on first use like matplotlib.
+    global _numpy
+    with _numpy_lock:
+        if _numpy is None:
+            import numpy
+            _numpy = numpy
+    return _numpy
+
+
+def sip_monthly_outflow(sips):
+    return sum(sip['amount'] * SIP_PERIODS_PER_YEAR.get(sip['frequency'], 12) / 12 for sip in sips)
+
+
+def project_sips(sips, years=SIP_PROJECTION_YEARS, rates=SIP_PROJECTION_RATES, today=None):
+    # Values every SIP's installment schedule at each month of the horizon under each
+    # assumed annual return, as one (rates, months, sips) array computation. Installments
+    # fall every 12 / periods-per-year months from start_date, so with t0 the first one's
+    # offset from today in months, K(T) = floor((T - t0) / step) + 1 of them are paid by
+    # month T, and at monthly growth g their value is the geometric series
+    # amount * (g ** (T - t0) - g ** (T - t0 - step * K)) / (1 - g ** -step).
+    np = load_numpy()
+    today = today or date.today()
+    sips = list(sips)
+    amounts = np.array([sip['amount'] for sip in sips], dtype=float)
+    steps = np.array([12 // SIP_PERIODS_PER_YEAR.get(sip['frequency'], 12) for sip in sips], dtype=float)
+    starts = [parse_date(sip['start_date']) for sip in sips]
+    first = np.array([(start.year - today.year) * 12 + start.month - today.month
+                      + (start.day - today.day) / 31 for start in starts], dtype=float)
+    months = np.arange(12 * years + 1, dtype=float)
+    elapsed = months[:, None] - first[None, :]
+    paid = np.where(elapsed >= 0, np.floor(elapsed / steps) + 1, 0.0)
+    log_g = (np.log1p(np.asarray(rates, dtype=float)) / 12)[:, None, None]
+    # g ** (T - t0) factors into an outer product, leaving one exp per element for the
+    # g ** (T - t0 - step * K) term.
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        grown = np.exp(log_g * months[:, None]) * np.exp(-log_g * first)
+        series = np.where(log_g == 0, paid,
+                          (grown - np.exp(log_g * (elapsed - steps * paid))) / -np.expm1(-log_g * steps))
+    return types.SimpleNamespace(
+        months=months,
+        rates=tuple(rates),
+        invested=paid @ amounts,
+        values=series @ amounts,
+        invested_to_date=float(paid[0] @ amounts),
+        monthly_outflow=sip_monthly_outflow(sips))
+
+
+def parse_date(text):
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        return datetime.strptime(text, "%Y-%m-%d").date()
+
+
+def parse_import_row(row):
+    if None in row or None in row.values():
+        raise ValueError("wrong number of fields")
+    amount = float(row['Amount'])
+    if not math.isfinite(amount) or amount <= 0:
+        raise ValueError(f"amount must be positive, got {row['Amount']!r}")
+    day = parse_date(row['Date'].strip()).isoformat()
+    # Ids are packed into ExpenseDateIndex keys, so they must fit its id bits.
+    row_id = int(row['ID'])
+    if not 1 <= row_id < 1 << ExpenseDateIndex.ID_BITS:
+        raise ValueError(f"id out of range, got {row['ID']!r}")
+    if row['Type'] == "Expense":
+        return 'expenses', {'id': row_id, 'date': day, 'category': row['Category'],
+                            'amount': amount, 'description': row['Description'] or ""}
+    if row['Type'] == "SIP":
+        return 'sips', {'id': row_id, 'name': row['Description'], 'amount': amount,
+                        'category': row['Category'], 'frequency': row['Frequency'], 'start_date': day}
+    raise ValueError(f"unknown row type {row['Type']!r}")
+
+
+def read_import_batches(path, batch_size=IMPORT_BATCH_ROWS):
+    # Streams an export file as (expenses, sips, bad_rows, fraction_read) batches so memory
+    # stays bounded by the batch size; bad rows are reported as (line, reason) and skipped.
+    size = os.path.getsize(path) or 1
+    with open(path, mode='r', newline='') as file:
+        reader = csv.DictReader(file)
+        batch = {'expenses': [], 'sips': []}
+        bad_rows = []
+        rows = 0
+        for row in reader:
+            try:
+                table, record = parse_import_row(row)
+            except (KeyError, TypeError, AttributeError, ValueError) as e:
+                bad_rows.append((reader.line_num, str(e)))
+            else:
+                batch[table].append(record)
+            rows += 1
+            if rows == batch_size:
+                yield batch['expenses'], batch['sips'], bad_rows, min(file.buffer.tell() / size, 1.0)
+                batch = {'expenses': [], 'sips': []}
+                bad_rows = []
+                rows = 0
+        yield batch['expenses'], batch['sips'], bad_rows, 1.0
+
+
+def replace_file(path, write, binary=False):
+    # write(file) fills a temp file beside path, which is fsynced and renamed over path, so
+    # a crash mid-write leaves the previous file intact rather than a truncated one.
+    staging = f"{path}.tmp"
+    with open(staging, mode='wb') if binary else open(staging, mode='w', newline='') as file:
+        write(file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(staging, path)
+
+
+class LedgerJournal:
+    def __init__(self, path):
+        self.path = path
+        self.entries = 0
+        if os.path.exists(path):
+            with open(path, mode='r') as file:
+                self.entries = sum(1 for line in file if line.strip())
+
+    def append(self, *ops):
+        # One write and one fsync for the whole group; a crash mid-append leaves at worst a
+        # torn last line, which replay stops at. A failed append is cut back off so the
+        # retry does not land behind a torn line.
+        with open(self.path, mode='ab') as file:
+            start = file.tell()
+            try:
+                file.write("".join(json.dumps(op) + "\n" for op in ops).encode('utf-8'))
+                file.flush()
+                os.fsync(file.fileno())
+            except OSError:
+                try:
+                    file.truncate(start)
+                except OSError:
+                    pass
+                raise
+        self.entries += len(ops)
+
+    def replay(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, mode='r') as file:
+            for line in file:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash mid-append; everything before it is intact.
+                    break
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.entries = 0
+
+
+class Profiler:
+    # Wall-clock spans with call and row counts per operation. Disabled, a span costs one
+    # attribute check. Enabled, each operation keeps its last PROFILE_SAMPLES durations for
+    # p50/p95, and spans go to a Chrome trace (a path ending in .json, loadable in
+    # chrome://tracing or Perfetto) or a rotating text log. The trace is written as an open
+    # JSON array, which both viewers accept, so it never has to be held in memory.
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.stats = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.trace = None
+        self.trace_path = None
+        self.traced = set()
+        self.log = None
+        self.origin = time.perf_counter()
+
+    def enable(self, path=None):
+        self.disable()
+        self.path = path
+        if path is not None and path.endswith(".json"):
+            # Recording again in the same run goes to a timestamped sibling rather than
+            # truncating the trace captured earlier.
+            self.trace_path = path
+            if path in self.traced:
+                stamp = time.strftime("%Y%m%d-%H%M%S")
+                self.trace_path = f"{path[:-len('.json')]}-{stamp}.json"
+                suffix = 1
+                while os.path.exists(self.trace_path):
+                    suffix += 1
+                    self.trace_path = f"{path[:-len('.json')]}-{stamp}-{suffix}.json"
+            self.traced.add(self.trace_path)
+            self.trace = open(self.trace_path, mode='w')
+            self.trace.write("[\n")
+        elif path is not None:
+            self.log = logging.getLogger("exchequer.perf")
+            self.log.propagate = False
+            self.log.setLevel(logging.INFO)
+            handler = logging.handlers.RotatingFileHandler(path, maxBytes=PROFILE_LOG_BYTES,
+                                                           backupCount=PROFILE_LOG_BACKUPS)
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            self.log.addHandler(handler)
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        with self.lock:
+            if self.trace is not None:
+                self.trace.close()
+                self.trace = None
+            if self.log is not None:
+                for handler in self.log.handlers[:]:
+                    handler.close()
+                    self.log.removeHandler(handler)
+                self.log = None
+
+    def span(self, name):
+        return _Span(self, name) if self.enabled else _NO_SPAN
+
+    def wrap(self, name, func):
+        def instrumented(*args, **kwargs):
+            if not self.enabled:
+                return func(*args, **kwargs)
+            with _Span(self, name):
+                return func(*args, **kwargs)
+        return instrumented
+
+    def count_rows(self, rows):
+        # Credits rows to the innermost open span on this thread.
+        spans = getattr(self.local, 'spans', None)
+        if spans:
+            spans[-1].rows += rows
+
+    def record(self, name, start, duration, rows):
+        with self.lock:
+            stat = self.stats.get(name)
+            if stat is None:
+                stat = self.stats[name] = {'calls': 0, 'rows': 0, 'total': 0.0,
+                                           'samples': deque(maxlen=PROFILE_SAMPLES)}
+            stat['calls'] += 1
+            stat['rows'] += rows
+            stat['total'] += duration
+            stat['samples'].append(duration)
+            if self.trace is not None:
+                event = {'name': name, 'ph': "X", 'pid': os.getpid(), 'tid': threading.get_ident(),
+                         'ts': round((start - self.origin) * 1e6), 'dur': round(duration * 1e6),
+                         'args': {'rows': rows}}
+                self.trace.write(json.dumps(event) + ",\n")
+                self.trace.flush()
+            elif self.log is not None:
+                self.log.info(f"{name} {duration * 1000:.3f}ms rows={rows} thread={threading.current_thread().name}")
+
+    def summary(self):
+        # (name, calls, rows, p50, p95) per operation, slowest total first.
+        with self.lock:
+            stats = [(name, stat['calls'], stat['rows'], stat['total'], sorted(stat['samples']))
+                     for name, stat in self.stats.items()]
+        stats.sort(key=lambda item: item[3], reverse=True)
+        return [(name, calls, rows, samples[(len(samples) - 1) // 2],
+                 samples[min(len(samples) - 1, math.ceil(len(samples) * 0.95) - 1)])
+                for name, calls, rows, _, samples in stats]
+
+    def reset(self):
+        with self.lock:
+            self.stats.clear()
+
+
+class _Span:
+    __slots__ = ('profiler', 'name', 'rows', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.rows = 0
+
+    def __enter__(self):
+        spans = getattr(self.profiler.local, 'spans', None)
+        if spans is None:
+            spans = self.profiler.local.spans = []
+        spans.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        duration = time.perf_counter() - self.start
+        self.profiler.local.spans.pop()
+        self.profiler.record(self.name, self.start, duration, self.rows)
+        return False
+
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class IOWorker:
+    # Runs persistence on one background thread so disk latency never reaches the Tk
+    # mainloop. Submitting a key that is already queued is a no-op: the queued run picks
+    # up whatever state is pending when it starts, so bursts of saves coalesce. Results
+    # and errors are handed back to the Tk thread by polling from root.after.
+    def __init__(self, root, on_error=None, profiler=None):
+        self.root = root
+        self.on_error = on_error
+        self.profiler = profiler
+        self.tasks = queue.Queue()
+        self.results = queue.Queue()
+        self.queued_keys = set()
+        self.lock = threading.Lock()
+        self.after_id = None
+        self.thread = threading.Thread(target=self._run, name="exchequer-io", daemon=True)
+        self.thread.start()
+
+    def submit(self, fn, on_done=None, on_error=None, key=None):
+        if key is not None:
+            with self.lock:
+                if key in self.queued_keys:
+                    return
+                self.queued_keys.add(key)
+        self.tasks.put((fn, on_done, on_error or self.on_error, key))
+        self._schedule_poll()
+
+    def _run(self):
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                self.tasks.task_done()
+                return
+            fn, on_done, on_error, key = task
+            if key is not None:
+                with self.lock:
+                    self.queued_keys.discard(key)
+            try:
+                if self.profiler is not None:
+                    with self.profiler.span(f"io.{getattr(fn, '__name__', 'task')}"):
+                        result = fn()
+                else:
+                    result = fn()
+            except Exception as e:
+                self.results.put((on_error, e))
+            else:
+                self.results.put((on_done, result))
+            finally:
+                self.tasks.task_done()
+
+    def _schedule_poll(self):
+        if self.after_id is None:
+            self.after_id = self.root.after(IO_POLL_MS, self._poll)
+
+    def _poll(self):
+        self.after_id = None
+        self.deliver()
+        if self.tasks.unfinished_tasks or not self.results.empty():
+            self._schedule_poll()
+
+    def deliver(self):
+        while True:
+            try:
+                callback, value = self.results.get_nowait()
+            except queue.Empty:
+                return
+            if callback is not None:
+                callback(value)
+
+    def flush(self):
+        self.tasks.join()
+        self.deliver()
+
+    def stop(self):
+        self.flush()
+        self.tasks.put(None)
+        self.thread.join()
+
+
+class MonthCategoryMatrix:
+    # Dense month x category spending totals: one array('d') column per category over a
+    # contiguous month range, so trend charts read whole columns and never the expenses.
+    # Cells are set, not accumulated, from the ExpenseAggregates buckets, so a month whose
+    # expenses are all deleted goes back to exactly zero.
+    def __init__(self):
+        self.first = None
+        self.length = 0
+        self.columns = {}
+
+    @staticmethod
+    def _index(month):
+        return int(month[:4]) * 12 + int(month[5:7]) - 1
+
+    def set(self, month, category, amount):
+        index = self._index(month)
+        if self.first is None:
+            self.first, self.length = index, 1
+        elif index < self.first:
+            pad = array('d', bytes(8 * (self.first - index)))
+            for column in self.columns.values():
+                column[0:0] = pad
+            self.length += self.first - index
+            self.first = index
+        elif index >= self.first + self.length:
+            pad = array('d', bytes(8 * (index + 1 - self.first - self.length)))
+            for column in self.columns.values():
+                column.extend(pad)
+            self.length = index + 1 - self.first
+        column = self.columns.get(category)
+        if column is None:
+            column = self.columns[category] = array('d', bytes(8 * self.length))
+        column[index - self.first] = amount
+
+    def months(self, start=0, stop=None):
+        stop = self.length if stop is None else stop
+        return [f"{index // 12:04d}-{index % 12 + 1:02d}" for index in range(self.first + start, self.first + stop)]
+
+    def window(self, count):
+        # The last count months up to the latest with spending, as (month labels,
+        # {category: amounts}). Months emptied by deletes at either end are left out.
+        used = [i for i in range(self.length) if any(column[i] for column in self.columns.values())]
+        if not used:
+            return [], {}
+        stop = used[-1] + 1
+        start = max(used[0], stop - count)
+        columns = {category: column[start:stop] for category, column in self.columns.items()}
+        return self.months(start, stop), {category: column for category, column in columns.items() if any(column)}
+
+
+class ExpenseAggregates:
+    # Running totals by month, day, category and month x category: the rollups the
+    # dashboard, budget alerts, charts and reports read. Every bucket keeps [amount, count] so it disappears
+    # once its last expense is removed instead of lingering as float residue.
+    def __init__(self, expenses=()):
+        self.total = 0.0
+        self.count = 0
+        self.categories = {}
+        self.months = {}
+        self.days = {}
+        self.month_categories = {}
+        self.matrix = MonthCategoryMatrix()
+        for exp in expenses:
+            self.add(exp)
+
+    @staticmethod
+    def _bump(table, key, amount, count):
+        entry = table.get(key)
+        if entry is None:
+            table[key] = [amount, count]
+        elif entry[1] + count == 0:
+            del table[key]
+        else:
+            entry[0] += amount
+            entry[1] += count
+
+    def _apply(self, exp, sign):
+        date = exp['date']
+        month = date[:7]
+        category = exp['category']
+        amount = sign * exp['amount']
+        self.count += sign
+        self.total = self.total + amount if self.count else 0.0
+        self._bump(self.categories, category, amount, sign)
+        self._bump(self.months, month, amount, sign)
+        self._bump(self.days, date, amount, sign)
+        self._bump(self.month_categories, (month, category), amount, sign)
+        self.matrix.set(month, category, self.month_categories.get((month, category), (0.0,))[0])
+
+    def add(self, exp):
+        self._apply(exp, 1)
+
+    def remove(self, exp):
+        self._apply(exp, -1)
+
+    def state(self):
+        # Detached, JSON-ready copy of every bucket, stored in binary ledger file headers.
+        return {
+            'total': self.total, 'count': self.count,
+            'categories': {key: list(entry) for key, entry in self.categories.items()},
+            'months': {key: list(entry) for key, entry in self.months.items()},
+            'days': {key: list(entry) for key, entry in self.days.items()},
+            'month_categories': [[month, category, *entry]
+                                 for (month, category), entry in self.month_categories.items()]
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        aggregates = cls()
+        aggregates.total = state['total']
+        aggregates.count = state['count']
+        aggregates.categories = state['categories']
+        aggregates.months = state['months']
+        aggregates.days = state['days']
+        for month, category, amount, count in state['month_categories']:
+            aggregates.month_categories[(month, category)] = [amount, count]
+            aggregates.matrix.set(month, category, amount)
+        return aggregates
+
+    def category_totals(self):
+        return {cat: entry[0] for cat, entry in self.categories.items()}
+
+    def month_total(self, month):
+        return self.months.get(month, (0.0,))[0]
+
+    def day_total(self, day):
+        return self.days.get(day, (0.0,))[0]
+
+    def month_category_totals(self, month):
+        totals = {}
+        for category in self.categories:
+            entry = self.month_categories.get((month, category))
+            if entry:
+                totals[category] = entry[0]
+        return totals
+
+
+def array_from(typecode, buffer):
+    # array(typecode, view) would convert item by item; frombytes is a single memcpy.
+    column = array(typecode)
+    column.frombytes(memoryview(buffer).cast('B'))
+    return column
+
+
+class StringHeap:
+    # Distinct description strings addressed by code; code 0 is the empty string. Strings
+    # are only ever appended, so the part read from a binary ledger file stays as offsets
+    # into its bytes and is decoded on first use, while newer strings live in a list.
+    def __init__(self, offsets=None, heap=b""):
+        self._offsets = offsets
+        self._heap = heap
+        self._mapped = 0 if offsets is None else len(offsets) - 1
+        self._decoded = {}
+        self._added = []
+        self._codes = {}
+        if offsets is None:
+            self.code("")
+        else:
+            self._codes[""] = 0
+
+    def __len__(self):
+        return self._mapped + len(self._added)
+
+    def __getitem__(self, code):
+        if code >= self._mapped:
+            return self._added[code - self._mapped]
+        text = self._decoded.get(code)
+        if text is None:
+            text = self._decoded[code] = str(self._heap[self._offsets[code]:self._offsets[code + 1]], 'utf-8')
+        return text
+
+    def code(self, text):
+        # Strings already in the mapped part are not looked up; a repeat costs one entry.
+        code = self._codes.get(text)
+        if code is None:
+            code = self._codes[text] = len(self)
+            self._added.append(text)
+        return code
+
+    def detach(self):
+        if isinstance(self._offsets, memoryview):
+            self._offsets = array_from('q', self._offsets)
+            self._heap = bytes(self._heap)
+
+    def copy(self):
+        clone = StringHeap.__new__(StringHeap)
+        clone._offsets = self._offsets
+        clone._heap = self._heap
+        clone._mapped = self._mapped
+        clone._decoded = {}
+        clone._added = list(self._added)
+        clone._codes = dict(self._codes)
+        return clone
+
+    def pack(self):
+        # (offsets, bytes) for the whole heap: the mapped part as is, then the added strings.
+        offsets = array('q', [0]) if self._offsets is None else array_from('q', self._offsets)
+        blobs = [bytes(self._heap)]
+        position = offsets[-1]
+        for text in self._added:
+            blob = text.encode('utf-8')
+            position += len(blob)
+            offsets.append(position)
+            blobs.append(blob)
+        return offsets, b"".join(blobs)
+
+    def nbytes(self):
+        return (len(self._heap) + 8 * self._mapped + 60 * len(self._decoded)
+                + sum(50 + len(text) for text in self._added))
+
+
+class ExpenseLedger:
+    # Column-oriented expense store: ids, date ordinals, category codes, amounts and
+    # description codes live in typed arrays, so a row costs a few dozen bytes instead of a
+    # dict. Rows are handed out as dicts on demand, which keeps the list-of-dicts API
+    # (append, iterate, csv.DictWriter) the rest of the app uses. Deleted rows are
+    # tombstoned and swept out once they outnumber the live ones.
+    def __init__(self, expenses=()):
+        self.categories = []
+        self._category_codes = {}
+        self.descriptions = StringHeap()
+        self._dates = {}
+        self._ids = array('q')
+        self._ordinals = array('i')
+        self._category_column = array('H')
+        self._amounts = array('d')
+        self._description_column = array('I')
+        self._alive = bytearray()
+        self._dead = 0
+        # Set while the columns are read-only views of a mapped ledger file; the first
+        # mutation copies them into arrays and lets the mapping go (see detach).
+        self._mapping = None
+        # Ids handed out by next_expense_id only grow, so lookups bisect the id column and
+        # need no extra memory. A ledger whose ids arrive out of order (imports, replayed
+        # re-adds) switches to a maintained id -> position dict instead.
+        self._positions = None
+        for exp in expenses:
+            self.append(exp)
+
+    def __len__(self):
+        return len(self._ids) - self._dead
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __iter__(self):
+        alive = self._alive
+        for pos in range(len(self._ids)):
+            if alive[pos]:
+                yield self._row(pos)
+
+    def _category_code(self, category):
+        code = self._category_codes.get(category)
+        if code is None:
+            code = self._category_codes[category] = len(self.categories)
+            self.categories.append(category)
+        return code
+
+    def _date_string(self, ordinal):
+        day = self._dates.get(ordinal)
+        if day is None:
+            day = self._dates[ordinal] = date.fromordinal(ordinal).isoformat()
+        return day
+
+    def _row(self, pos):
+        return {
+            'id': self._ids[pos],
+            'date': self._date_string(self._ordinals[pos]),
+            'category': self.categories[self._category_column[pos]],
+            'amount': self._amounts[pos],
+            'description': self.descriptions[self._description_column[pos]]
+        }
+
+    def _position(self, expense_id):
+        if self._positions is not None:
+            return self._positions.get(expense_id)
+        pos = bisect.bisect_left(self._ids, expense_id)
+        if pos < len(self._ids) and self._ids[pos] == expense_id and self._alive[pos]:
+            return pos
+        return None
+
+    def _index_positions(self):
+        self._positions = {self._ids[pos]: pos for pos in range(len(self._ids)) if self._alive[pos]}
+
+    def __contains__(self, expense_id):
+        return self._position(expense_id) is not None
+
+    def _columns(self, exp):
+        description = exp['description'] or ""
+        return (parse_date(exp['date']).toordinal(),
+                self._category_code(exp['category']),
+                float(exp['amount']),
+                self.descriptions.code(description))
+
+    def append(self, exp):
+        self.detach()
+        expense_id = int(exp['id'])
+        ordinal, code, amount, description = self._columns(exp)
+        if self._positions is None and self._ids and expense_id <= self._ids[-1]:
+            self._index_positions()
+        if self._positions is not None:
+            self._positions[expense_id] = len(self._ids)
+        self._ids.append(expense_id)
+        self._ordinals.append(ordinal)
+        self._category_column.append(code)
+        self._amounts.append(amount)
+        self._description_column.append(description)
+        self._alive.append(1)
+
+    def get(self, expense_id):
+        pos = self._position(expense_id)
+        return None if pos is None else self._row(pos)
+
+    def ordinal(self, expense_id):
+        return self._ordinals[self._position(expense_id)]
+
+    def update(self, exp):
+        pos = self._position(exp['id'])
+        if pos is None:
+            raise KeyError(exp['id'])
+        self.detach()
+        (self._ordinals[pos], self._category_column[pos],
+         self._amounts[pos], self._description_column[pos]) = self._columns(exp)
+
+    def remove(self, expense_id):
+        pos = self._position(expense_id)
+        if pos is None:
+            return None
+        row = self._row(pos)
+        self.detach()
+        self._alive[pos] = 0
+        self._description_column[pos] = 0
+        self._dead += 1
+        if self._positions is not None:
+            del self._positions[expense_id]
+        if self._dead > 1024 and self._dead * 2 > len(self._ids):
+            self._sweep()
+        return row
+
+    def _sweep(self):
+        keep = [pos for pos in range(len(self._ids)) if self._alive[pos]]
+        self._ids = array('q', (self._ids[pos] for pos in keep))
+        self._ordinals = array('i', (self._ordinals[pos] for pos in keep))
+        self._category_column = array('H', (self._category_column[pos] for pos in keep))
+        self._amounts = array('d', (self._amounts[pos] for pos in keep))
+        strings = StringHeap()
+        self._description_column = array(
+            'I', (strings.code(self.descriptions[self._description_column[pos]]) for pos in keep))
+        self.descriptions = strings
+        self._alive = bytearray(b"\x01") * len(keep)
+        self._dead = 0
+        if self._positions is not None:
+            self._index_positions()
+
+    def copy(self):
+        # A detached copy the I/O thread can serialise while the original keeps changing;
+        # the typed columns copy at memcpy speed. Mapped columns are read-only, so a copy
+        # of a mapped ledger shares them.
+        clone = ExpenseLedger()
+        clone.categories = list(self.categories)
+        clone._category_codes = dict(self._category_codes)
+        clone.descriptions = self.descriptions.copy()
+        clone._dates = dict(self._dates)
+        clone._ids = self._ids[:]
+        clone._ordinals = self._ordinals[:]
+        clone._category_column = self._category_column[:]
+        clone._amounts = self._amounts[:]
+        clone._description_column = self._description_column[:]
+        clone._alive = bytearray(self._alive)
+        clone._dead = self._dead
+        clone._positions = None if self._positions is None else dict(self._positions)
+        clone._mapping = self._mapping
+        return clone
+
+    def detach(self):
+        if self._mapping is None:
+            return
+        self._ids = array_from('q', self._ids)
+        self._ordinals = array_from('i', self._ordinals)
+        self._category_column = array_from('H', self._category_column)
+        self._amounts = array_from('d', self._amounts)
+        self._description_column = array_from('I', self._description_column)
+        self.descriptions.detach()
+        self._mapping = None
+
+    def write_file(self, file, **header):
+        # Fixed-width binary image of the ledger, tombstones included, so open_file can map
+        # it back without parsing. Extra keyword arguments are stored in the JSON header.
+        offsets, heap = self.descriptions.pack()
+        columns = [self._ids, self._ordinals, self._category_column, self._amounts,
+                   self._description_column, self._alive, offsets, heap]
+        sections = []
+        position = 0
+        for column in columns:
+            size = memoryview(column).nbytes
+            sections.append([position, size])
+            position += size + -size % 8
+        header.update(rows=len(self._ids), dead=self._dead, ordered=self._positions is None,
+                      byteorder=sys.byteorder, categories=self.categories, sections=sections)
+        encoded = json.dumps(header).encode('utf-8')
+        file.write(LEDGER_MAGIC + len(encoded).to_bytes(8, 'little'))
+        file.write(encoded + b" " * (-len(encoded) % 8))
+        for column, (_, size) in zip(columns, sections):
+            file.write(column)
+            file.write(bytes(-size % 8))
+
+    @classmethod
+    def open_file(cls, path):
+        # Maps a write_file image and returns (ledger, header). The columns are memoryviews
+        # straight onto the mapping, so opening costs the same at any size.
+        with open(path, mode='rb') as file:
+            mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapping)
+        if view[:8] != LEDGER_MAGIC:
+            raise ValueError(f"{path} is not an expense ledger file")
+        length = int.from_bytes(view[8:16], 'little')
+        header = json.loads(bytes(view[16:16 + length]))
+        if header['byteorder'] != sys.byteorder:
+            raise ValueError(f"{path} was written on a {header['byteorder']}-endian machine")
+        base = 16 + length + -length % 8
+        offset, size = header['sections'][-1]
+        if base + offset + size > len(view):
+            raise ValueError(f"{path} is truncated")
+        columns = [view[base + offset:base + offset + size].cast(code)
+                   for (offset, size), code in zip(header['sections'], LEDGER_COLUMNS)]
+        ledger = cls()
+        ledger.categories = header['categories']
+        ledger._category_codes = {category: code for code, category in enumerate(ledger.categories)}
+        (ledger._ids, ledger._ordinals, ledger._category_column, ledger._amounts,
+         ledger._description_column, alive, offsets, heap) = columns
+        ledger._alive = bytearray(alive)
+        ledger._dead = header['dead']
+        ledger.descriptions = StringHeap(offsets, heap)
+        ledger._mapping = mapping
+        if not header['ordered']:
+            ledger._index_positions()
+        return ledger, header
+
+    def iter_dates(self):
+        alive = self._alive
+        for pos, (expense_id, ordinal) in enumerate(zip(self._ids, self._ordinals)):
+            if alive[pos]:
+                yield expense_id, ordinal
+
+    def max_id(self):
+        if self._positions is not None:
+            return max(self._positions, default=0)
+        # Ascending ids: the last live row holds the largest.
+        for pos in range(len(self._ids) - 1, -1, -1):
+            if self._alive[pos]:
+                return self._ids[pos]
+        return 0
+
+    def nbytes(self):
+        columns = (self._ids, self._ordinals, self._category_column, self._amounts, self._description_column)
+        return (sum(column.itemsize * len(column) for column in columns)
+                + len(self._alive) + self.descriptions.nbytes())
+
+
+class SipLedger:
+    # SIPs are few enough to stay as dicts; keying them by id makes delete and lookup O(1)
+    # while iteration still yields rows in insertion order like the old list did.
+    def __init__(self, sips=()):
+        self._rows = {}
+        for sip in sips:
+            self.append(sip)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __bool__(self):
+        return bool(self._rows)
+
+    def __iter__(self):
+        return iter(self._rows.values())
+
+    def __contains__(self, sip_id):
+        return sip_id in self._rows
+
+    def append(self, sip):
+        sip['id'] = int(sip['id'])
+        sip['amount'] = float(sip['amount'])
+        self._rows[sip['id']] = sip
+
+    def get(self, sip_id):
+        return self._rows.get(sip_id)
+
+    def remove(self, sip_id):
+        return self._rows.pop(sip_id, None)
+
+    def max_id(self):
+        return max(self._rows, default=0)
+
+
+class ExpenseDateIndex:
+    # Expense ids bucketed by (year, month). Each bucket is an array of (ordinal << 40 | id)
+    # keys kept sorted, so month/year filters are bucket lookups and newest-first order
+    # needs no sorting. Dates are parsed once, when an expense enters the ledger.
+    ID_BITS = 40
+    ID_MASK = (1 << ID_BITS) - 1
+
+    def __init__(self, ledger):
+        self.ledger = ledger
+        self.buckets = {}
+        self._months = {}
+        staged = {}
+        for expense_id, ordinal in ledger.iter_dates():
+            staged.setdefault(self._month(ordinal), []).append(ordinal << self.ID_BITS | expense_id)
+        for key, packed in staged.items():
+            packed.sort()
+            self.buckets[key] = array('q', packed)
+        self.keys = sorted(self.buckets)
+
+    def _month(self, ordinal):
+        key = self._months.get(ordinal)
+        if key is None:
+            day = date.fromordinal(ordinal)
+            key = self._months[ordinal] = (day.year, day.month)
+        return key
+
+    def add(self, exp):
+        ordinal = parse_date(exp['date']).toordinal()
+        key = self._month(ordinal)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = array('q')
+            bisect.insort(self.keys, key)
+        bisect.insort(bucket, ordinal << self.ID_BITS | exp['id'])
+
+    def remove(self, exp):
+        ordinal = parse_date(exp['date']).toordinal()
+        key = self._month(ordinal)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            return
+        packed = ordinal << self.ID_BITS | exp['id']
+        pos = bisect.bisect_left(bucket, packed)
+        if pos < len(bucket) and bucket[pos] == packed:
+            del bucket[pos]
+        if not bucket:
+            del self.buckets[key]
+            self.keys.remove(key)
+
+    def _matches(self, key, year, month):
+        return (year is None or key[0] == year) and (month is None or key[1] == month)
+
+    def newest_first(self, year=None, month=None):
+        for key in reversed(self.keys):
+            if self._matches(key, year, month):
+                for packed in reversed(self.buckets[key]):
+                    yield self.ledger.get(packed & self.ID_MASK)
+
+    def count(self, year=None, month=None):
+        return sum(len(self.buckets[key]) for key in self.keys if self._matches(key, year, month))
+
+    def select(self, ids, year=None, month=None):
+        packed = []
+        for expense_id in ids:
+            ordinal = self.ledger.ordinal(expense_id)
+            if self._matches(self._month(ordinal), year, month):
+                packed.append(ordinal << self.ID_BITS | expense_id)
+        packed.sort(reverse=True)
+        return [self.ledger.get(key & self.ID_MASK) for key in packed]
+
+    def latest(self):
+        if not self.keys:
+            return None
+        return self.ledger.get(self.buckets[self.keys[-1]][-1] & self.ID_MASK)
+
+
+class ExpenseSearchIndex:
+    # Inverted index from description/category tokens to expense ids. A query matches an
+    # expense when every query token is a prefix of one of its tokens. The last result is
+    # kept so a query that only appends characters filters it instead of the whole index.
+    def __init__(self, expenses=()):
+        self.postings = {}
+        self.tokens = []
+        self.doc_tokens = {}
+        self.version = 0
+        self._last = None
+        for exp in expenses:
+            self.add(exp)
+
+    @staticmethod
+    def tokenize(text):
+        return re.findall(r"\w+", text.lower())
+
+    def add(self, exp):
+        tokens = tuple(set(self.tokenize(f"{exp['description']} {exp['category']}")))
+        self.doc_tokens[exp['id']] = tokens
+        for token in tokens:
+            ids = self.postings.get(token)
+            if ids is None:
+                ids = self.postings[token] = set()
+                bisect.insort(self.tokens, token)
+            ids.add(exp['id'])
+        self.version += 1
+
+    def remove(self, exp):
+        for token in self.doc_tokens.pop(exp['id'], ()):
+            ids = self.postings[token]
+            ids.discard(exp['id'])
+            if not ids:
+                del self.postings[token]
+                del self.tokens[bisect.bisect_left(self.tokens, token)]
+        self.version += 1
+
+    def _prefix_ids(self, prefix):
+        ids = set()
+        start = bisect.bisect_left(self.tokens, prefix)
+        for token in itertools.islice(self.tokens, start, None):
+            if not token.startswith(prefix):
+                break
+            ids |= self.postings[token]
+        return ids
+
+    def search(self, query):
+        query = query.lower()
+        terms = self.tokenize(query)
+        if not terms:
+            return None
+        last = self._last
+        if last and last[1] == self.version and query.startswith(last[0]):
+            ids = {expense_id for expense_id in last[2]
+                   if all(any(token.startswith(term) for token in self.doc_tokens[expense_id]) for term in terms)}
+        else:
+            ids = None
+            for term in sorted(terms, key=len, reverse=True):
+                matched = self._prefix_ids(term)
+                ids = matched if ids is None else ids & matched
+                if not ids:
+                    break
+        self._last = (query, self.version, ids)
+        return ids
+
+
+class CsvLedgerStore:
+    # One user's ledger held in memory together with its indexes, persisted as CSV
+    # snapshots plus a journal of the mutations made since the last snapshot. Writes are
+    # staged under a lock and performed by _flush, on the I/O worker when there is one.
+    def __init__(self, username, io=None):
+        self.username = username
+        self.csv_file = f"expenses_{username}.csv"
+        self.sip_csv_file = f"sips_{username}.csv"
+        self.goals_file = f"goals_{username}.csv"
+        self.journal_file = f"journal_{username}.jsonl"
+        self.expenses = ExpenseLedger()
+        self.sips = SipLedger()
+        self.goals = {}
+        self.journal = None
+        self.next_expense_id = 1
+        self.next_sip_id = 1
+        self.io = io
+        self._lock = threading.Lock()
+        self._pending_snapshot = None
+        self._pending_ops = []
+        self._journal_entries = 0
+        self._disk_state = None
+        self.commit_window = COMMIT_WINDOW_MS / 1000
+        self._group_deadline = None
+        self.commits = 0
+        self._importing = False
+
+    def _files(self):
+        return self.csv_file, self.sip_csv_file, self.goals_file, self.journal_file
+
+    def exists(self):
+        return any(os.path.exists(path) for path in self._files())
+
+    def load(self):
+        # Starts from empty, so a user with only a journal so far gets exactly what it
+        # replays, not whatever an aborted import left in memory.
+        self.sips = SipLedger()
+        self.goals = {}
+        self._load_expenses()
+        if os.path.exists(self.sip_csv_file):
+            with open(self.sip_csv_file, mode='r', newline='') as file:
+                self.sips = SipLedger(csv.DictReader(file))
+        if os.path.exists(self.goals_file):
+            with open(self.goals_file, mode='r', newline='') as file:
+                self.goals = {row['category']: float(row['amount']) for row in csv.DictReader(file)}
+        self.journal = LedgerJournal(self.journal_file)
+        self._journal_entries = self.journal.entries
+        self._replay_journal()
+        self.next_expense_id = self.expenses.max_id() + 1
+        self.next_sip_id = self.sips.max_id() + 1
+        self._disk_state = self._file_state()
+
+    def _load_expenses(self):
+        self.expenses = ExpenseLedger()
+        if os.path.exists(self.csv_file):
+            with open(self.csv_file, mode='r', newline='') as file:
+                self.expenses = ExpenseLedger(csv.DictReader(file))
+        self._rebuild_indexes()
+
+    def _file_state(self):
+        state = []
+        for path in self._files():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                state.append(None)
+            else:
+                state.append((stat.st_mtime_ns, stat.st_size))
+        return tuple(state)
+
+    def is_current(self):
+        # True while the ledger in memory is still what is on disk: loaded, and no other
+        # process (the batch CLI, another window) has written the files since our last flush.
+        return self.journal is not None and self._file_state() == self._disk_state
+
+    def nbytes(self):
+        # Resident size estimate: the columns exactly, the rest from measured per-entry costs.
+        if self.journal is None:
+            return 0
+        aggregates = self.aggregates
+        buckets = (len(aggregates.categories) + len(aggregates.months) + len(aggregates.days)
+                   + len(aggregates.month_categories))
+        total = self.expenses.nbytes() + 150 * buckets + 400 * len(self.sips)
+        if self.date_index is not None:
+            total += 16 * len(self.expenses)
+        if self.search_index is not None:
+            total += 450 * len(self.expenses)
+        return total
+
+    def _replay_journal(self):
+        # Replay is idempotent (adds are upserts, deletes of unknown ids are ignored) so a
+        # crash between writing a snapshot and clearing the journal loses nothing. Ops are
+        # applied in place, through the aggregates, so only the journaled rows are touched.
+        for op in self.journal.replay():
+            if op['table'] == 'goals':
+                self.goals = {cat: float(amt) for cat, amt in op['row'].items()}
+                continue
+            if op['op'] == 'delete':
+                if op['table'] == 'sips':
+                    self.sips.remove(op['id'])
+                else:
+                    exp = self.expenses.remove(op['id'])
+                    if exp:
+                        self._unindex(exp)
+                continue
+            row = op['row']
+            row['amount'] = float(row['amount'])
+            row['id'] = int(row['id'])
+            if op['table'] == 'sips':
+                if row['id'] in self.sips:
+                    self.sips.get(row['id']).update(row)
+                else:
+                    self.sips.append(row)
+            else:
+                old = self.expenses.get(row['id'])
+                if old is None:
+                    self.expenses.append(row)
+                else:
+                    self._unindex(old)
+                    row = dict(old, **row)
+                    self.expenses.update(row)
+                self._index(row)
+
+    def _rebuild_indexes(self):
+        # Aggregates are always kept; the date and search indexes are built on the first
+        # query that needs them, so loads, bulk ingests and headless reports skip them.
+        self.aggregates = ExpenseAggregates(self.expenses)
+        self.date_index = None
+        self.search_index = None
+
+    def _dates(self):
+        if self.date_index is None:
+            self.date_index = ExpenseDateIndex(self.expenses)
+        return self.date_index
+
+    def _search(self):
+        if self.search_index is None:
+            self.search_index = ExpenseSearchIndex(self.expenses)
+        return self.search_index
+
+    def _index(self, exp):
+        self.aggregates.add(exp)
+        if self.date_index is not None:
+            self.date_index.add(exp)
+        if self.search_index is not None:
+            self.search_index.add(exp)
+
+    def _unindex(self, exp):
+        self.aggregates.remove(exp)
+        if self.date_index is not None:
+            self.date_index.remove(exp)
+        if self.search_index is not None:
+            self.search_index.remove(exp)
+
+    def _record(self, table, op, rows):
+        if not rows:
+            return
+        if op == 'delete':
+            ops = [{'op': op, 'table': table, 'id': row['id']} for row in rows]
+        else:
+            ops = [{'op': op, 'table': table, 'row': dict(row)} for row in rows]
+        self._journal_entries += len(ops)
+        if self._journal_entries >= max(JOURNAL_COMPACT_MIN, len(self.expenses) + len(self.sips)):
+            self.save()
+            return
+        with self._lock:
+            self._pending_ops.extend(ops)
+        self._schedule_flush()
+
+    def save(self):
+        # The snapshot covers every op staged so far, so those are dropped rather than
+        # journaled after it.
+        snapshot = (self._expense_snapshot(), list(self.sips), dict(self.goals))
+        with self._lock:
+            self._pending_snapshot = snapshot
+            self._pending_ops = []
+        self._journal_entries = 0
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        # An import in progress holds everything back: finish_import's snapshot covers it
+        # and abort_import drops it, so a cancelled replace never reaches the disk.
+        if self._importing:
+            return
+        if self.io is None:
+            self._flush()
+            return
+        with self._lock:
+            if self._group_deadline is None:
+                self._group_deadline = time.monotonic() + self.commit_window
+        self.io.submit(self._flush, key=self)
+
+    def _flush(self):
+        # Group commit: on the I/O worker a flush first waits out the commit window opened
+        # by the group's first mutation, so a burst of edits becomes one journal append and
+        # one fsync. Without a worker every mutation commits on its own.
+        with self._lock:
+            deadline = self._group_deadline
+        if deadline is not None:
+            time.sleep(max(0.0, deadline - time.monotonic()))
+        with self._lock:
+            self._group_deadline = None
+            snapshot, self._pending_snapshot = self._pending_snapshot, None
+            ops, self._pending_ops = self._pending_ops, []
+        try:
+            if snapshot is not None:
+                self._write_snapshot(*snapshot)
+                snapshot = None
+            if ops:
+                self.journal.append(*ops)
+        except Exception:
+            self._requeue(snapshot, ops)
+            raise
+        if snapshot is not None or ops:
+            self.commits += 1
+        self._disk_state = self._file_state()
+
+    def _requeue(self, snapshot, ops):
+        # A failed write goes back ahead of whatever was staged since, so the next flush
+        # retries it, unless a newer snapshot was staged that already covers it.
+        with self._lock:
+            if self._pending_snapshot is not None:
+                return
+            if snapshot is not None:
+                self._pending_snapshot = snapshot
+            self._pending_ops[:0] = ops
+
+    def _expense_snapshot(self):
+        return self.expenses.copy()
+
+    @staticmethod
+    def _csv_writer(fieldnames, rows):
+        def write(file):
+            writer = csv.DictWriter(file, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+        return write
+
+    def _write_expenses(self, expenses):
+        replace_file(self.csv_file, self._csv_writer(EXPENSE_FIELDS, expenses))
+
+    def _write_snapshot(self, expenses, sips, goals):
+        # Each file is replaced atomically and the journal is only cleared after all of
+        # them, so a crash part-way through is repaired by replaying the journal.
+        self._write_expenses(expenses)
+        replace_file(self.sip_csv_file, self._csv_writer(SIP_FIELDS, sips))
+        replace_file(self.goals_file, self._csv_writer(
+            ['category', 'amount'], [{'category': cat, 'amount': amt} for cat, amt in goals.items()]))
+        self.journal.clear()
+
+    def close(self):
+        if self.journal is not None and self._journal_entries:
+            self.save()
+        if self.io is not None:
+            self.io.flush()
+
+    def export_rows(self):
+        return self.expenses.copy(), list(self.sips)
+
+    def add_expense(self, fields):
+        exp = dict(fields, id=self.next_expense_id)
+        self.next_expense_id += 1
+        self.expenses.append(exp)
+        self._index(exp)
+        self._record('expenses', 'add', [exp])
+        return exp
+
+    def get_expense(self, expense_id):
+        return self.expenses.get(expense_id)
+
+    def update_expenses(self, rows):
+        changed = []
+        for exp in rows:
+            old = self.expenses.get(exp['id'])
+            if old is None:
+                continue
+            self._unindex(old)
+            self.expenses.update(exp)
+            self._index(exp)
+            changed.append(exp)
+        self._record('expenses', 'edit', changed)
+
+    def remove_expenses(self, expense_ids):
+        removed = []
+        for expense_id in expense_ids:
+            exp = self.expenses.remove(expense_id)
+            if exp:
+                self._unindex(exp)
+                removed.append(exp)
+        self._record('expenses', 'delete', removed)
+        return removed
+
+    def iter_expenses(self):
+        return iter(self.expenses)
+
+    def expense_count(self):
+        return len(self.expenses)
+
+    def query_expenses(self, year=None, month=None, search=""):
+        date_index = self._dates()
+        rows = date_index.newest_first(year=year, month=month)
+        total = date_index.count(year=year, month=month)
+        matches = self._search().search(search) if search.strip() else None
+        if matches is not None:
+            if len(matches) * 4 < total:
+                rows = date_index.select(matches, year=year, month=month)
+                total = len(rows)
+            else:
+                # Broad queries match most of the range; walk it lazily instead of sorting.
+                rows = (exp for exp in rows if exp['id'] in matches)
+                total = None
+        return rows, total
+
+    def expense_total(self):
+        return self.aggregates.total
+
+    def category_totals(self, month=None):
+        if month is None:
+            return self.aggregates.category_totals()
+        return self.aggregates.month_category_totals(month)
+
+    def month_total(self, month):
+        return self.aggregates.month_total(month)
+
+    def day_total(self, day):
+        return self.aggregates.day_total(day)
+
+    def latest_expense(self):
+        return self._dates().latest()
+
+    def month_category_rollup(self):
+        return sorted((month, category, entry[0], entry[1])
+                      for (month, category), entry in self.aggregates.month_categories.items())
+
+    def month_category_matrix(self):
+        return self.aggregates.matrix
+
+    def add_sip(self, fields):
+        sip = dict(fields, id=self.next_sip_id)
+        self.next_sip_id += 1
+        self.sips.append(sip)
+        self._record('sips', 'add', [sip])
+        return sip
+
+    def remove_sips(self, sip_ids):
+        removed = [sip for sip in map(self.sips.remove, sip_ids) if sip]
+        self._record('sips', 'delete', removed)
+        return removed
+
+    def set_goals(self, goals):
+        self.goals = dict(goals)
+        self._record('goals', 'set', [self.goals])
+
+    def begin_import(self, merge):
+        self._importing = True
+        if not merge:
+            self.expenses = ExpenseLedger()
+            self.sips = SipLedger()
+            self.next_expense_id = 1
+            self.next_sip_id = 1
+            self._rebuild_indexes()
+
+    def import_rows(self, expenses, sips, remap):
+        # Imported rows keep their ids unless merging or the id is already taken.
+        for exp in expenses:
+            if remap or exp['id'] in self.expenses:
+                exp['id'] = self.next_expense_id
+            self.next_expense_id = max(self.next_expense_id, exp['id'] + 1)
+            self.expenses.append(exp)
+            self._index(exp)
+        for sip in sips:
+            if remap or sip['id'] in self.sips:
+                sip['id'] = self.next_sip_id
+            self.next_sip_id = max(self.next_sip_id, sip['id'] + 1)
+            self.sips.append(sip)
+
+    def finish_import(self):
+        self._importing = False
+        self.save()
+
+    def abort_import(self):
+        self._importing = False
+        with self._lock:
+            self._pending_snapshot = None
+            self._pending_ops = []
+        if self.io is not None:
+            self.io.flush()
+        self.load()
+
+
+class BinaryLedgerStore(CsvLedgerStore):
+    # CsvLedgerStore whose expense snapshot is a binary ledger file (ExpenseLedger.write_file)
+    # instead of a CSV. Login maps the file and takes the aggregates from its header, so
+    # it costs the same for any ledger size; only the journal since the last snapshot is
+    # replayed. SIPs and goals stay in CSV, and CSV remains the export format. A user with
+    # only a CSV snapshot is read from it once and moved over by the next save.
+    def __init__(self, username, io=None):
+        super().__init__(username, io)
+        self.ledger_file = f"expenses_{username}.ledger"
+
+    def _files(self):
+        return (self.ledger_file,) + super()._files()
+
+    def _load_expenses(self):
+        if not os.path.exists(self.ledger_file):
+            super()._load_expenses()
+            return
+        self.expenses, header = ExpenseLedger.open_file(self.ledger_file)
+        self.aggregates = ExpenseAggregates.from_state(header['aggregates'])
+        self.date_index = None
+        self.search_index = None
+
+    def _expense_snapshot(self):
+        # Copy the mapped columns out first: the snapshot replaces the file, and Windows
+        # will not replace a file that is still mapped.
+        self.expenses.detach()
+        return self.expenses.copy(), self.aggregates.state()
+
+    def _write_expenses(self, snapshot):
+        expenses, aggregates = snapshot
+        replace_file(self.ledger_file, lambda file: expenses.write_file(file, aggregates=aggregates), binary=True)
+
+
+class SqliteLedgerStore:
+    # Keeps expenses in a shared SQLite file and answers the history filters and dashboard
+    # totals with indexed queries instead of loading the ledger. Per-month/category totals
+    # come from a rollup table the triggers below keep current. SIPs and goals are small
+    # and stay loaded. A user's CSV files are copied in the first time they open it.
+    # Mutations run immediately on the shared connection; the commit is what gets handed
+    # to the I/O worker, serialised with writers by _lock. Search reads expense_tokens,
+    # filled with ExpenseSearchIndex.tokenize's tokens so it matches the in-memory index.
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS expenses (
+            user TEXT NOT NULL,
+            id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            category TEXT NOT NULL,
+            amount REAL NOT NULL,
+            description TEXT NOT NULL DEFAULT '',
+            PRIMARY KEY (user, id)
+        );
+        CREATE INDEX IF NOT EXISTS expenses_user_date ON expenses (user, date, id);
+        CREATE INDEX IF NOT EXISTS expenses_user_category_date ON expenses (user, category, date);
+        CREATE TABLE IF NOT EXISTS expense_rollup (
+            user TEXT NOT NULL,
+            month TEXT NOT NULL,
+            category TEXT NOT NULL,
+            amount REAL NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (user, month, category)
+        );
+        CREATE TRIGGER IF NOT EXISTS expenses_rollup_insert AFTER INSERT ON expenses BEGIN
+            INSERT INTO expense_rollup (user, month, category, amount, count)
+            VALUES (NEW.user, substr(NEW.date, 1, 7), NEW.category, NEW.amount, 1)
+            ON CONFLICT (user, month, category) DO UPDATE SET amount = amount + excluded.amount, count = count + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS expenses_rollup_delete AFTER DELETE ON expenses BEGIN
+            UPDATE expense_rollup SET amount = amount - OLD.amount, count = count - 1
+            WHERE user = OLD.user AND month = substr(OLD.date, 1, 7) AND category = OLD.category;
+            DELETE FROM expense_rollup
+            WHERE user = OLD.user AND month = substr(OLD.date, 1, 7) AND category = OLD.category AND count <= 0;
+        END;
+        CREATE TRIGGER IF NOT EXISTS expenses_rollup_update AFTER UPDATE OF date, category, amount ON expenses BEGIN
+            UPDATE expense_rollup SET amount = amount - OLD.amount, count = count - 1
+            WHERE user = OLD.user AND month = substr(OLD.date, 1, 7) AND category = OLD.category;
+            DELETE FROM expense_rollup
+            WHERE user = OLD.user AND month = substr(OLD.date, 1, 7) AND category = OLD.category AND count <= 0;
+            INSERT INTO expense_rollup (user, month, category, amount, count)
+            VALUES (NEW.user, substr(NEW.date, 1, 7), NEW.category, NEW.amount, 1)
+            ON CONFLICT (user, month, category) DO UPDATE SET amount = amount + excluded.amount, count = count + 1;
+        END;
+        CREATE TABLE IF NOT EXISTS expense_tokens (
+            user TEXT NOT NULL,
+            token TEXT NOT NULL,
+            id INTEGER NOT NULL,
+            PRIMARY KEY (user, token, id)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS sips (
+            user TEXT NOT NULL,
+            id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            amount REAL NOT NULL,
+            category TEXT NOT NULL,
+            frequency TEXT NOT NULL,
+            start_date TEXT NOT NULL,
+            PRIMARY KEY (user, id)
+        );
+        CREATE TABLE IF NOT EXISTS goals (
+            user TEXT NOT NULL,
+            category TEXT NOT NULL,
+            amount REAL NOT NULL,
+            PRIMARY KEY (user, category)
+        );
+        CREATE TABLE IF NOT EXISTS migrated_users (user TEXT PRIMARY KEY);
+    """
+    PAGE_SIZE = 500
+
+    def __init__(self, username, path=SQLITE_DB_FILE, io=None):
+        self.username = username
+        self.path = path
+        self.io = io
+        self._lock = threading.RLock()
+        self.conn = None
+        self.sips = SipLedger()
+        self.goals = {}
+        self.next_expense_id = 1
+        self.next_sip_id = 1
+        self._importing = False
+
+    def load(self):
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            # 64 MB of page cache keeps a bulk import's transaction from spilling to disk.
+            self.conn.execute("PRAGMA cache_size = -65536")
+            self.conn.executescript(self.SCHEMA)
+        self._migrate_csv()
+        self._backfill_tokens()
+        self.sips = SipLedger(dict(zip(SIP_FIELDS, row)) for row in self.conn.execute(
+            "SELECT id, name, amount, category, frequency, start_date FROM sips WHERE user = ? ORDER BY rowid",
+            (self.username,)))
+        self.goals = dict(self.conn.execute(
+            "SELECT category, amount FROM goals WHERE user = ?", (self.username,)))
+        max_id = self.conn.execute("SELECT MAX(id) FROM expenses WHERE user = ?", (self.username,)).fetchone()[0]
+        self.next_expense_id = (max_id or 0) + 1
+        self.next_sip_id = self.sips.max_id() + 1
+
+    def _migrate_csv(self):
+        if self.conn.execute("SELECT 1 FROM migrated_users WHERE user = ?", (self.username,)).fetchone():
+            return
+        legacy = CsvLedgerStore(self.username)
+        with self.conn:
+            if legacy.exists():
+                legacy.load()
+                self._insert_expenses(legacy.iter_expenses())
+                self._insert_sips(legacy.sips)
+                self.conn.executemany("INSERT OR REPLACE INTO goals (user, category, amount) VALUES (?, ?, ?)",
+                                      ((self.username, cat, amt) for cat, amt in legacy.goals.items()))
+            self.conn.execute("INSERT INTO migrated_users (user) VALUES (?)", (self.username,))
+
+    def _backfill_tokens(self):
+        # Databases written before expense_tokens existed get it filled once per user.
+        if (self.conn.execute("SELECT 1 FROM expense_tokens WHERE user = ? LIMIT 1", (self.username,)).fetchone()
+                or not self.conn.execute("SELECT 1 FROM expenses WHERE user = ? LIMIT 1", (self.username,)).fetchone()):
+            return
+        with self._lock, self.conn:
+            rows = self.conn.execute(
+                "SELECT user, id, date, category, amount, description FROM expenses WHERE user = ?", (self.username,))
+            self.conn.executemany("INSERT OR IGNORE INTO expense_tokens (user, token, id) VALUES (?, ?, ?)",
+                                  self._tokens(rows.fetchall()))
+
+    @staticmethod
+    def _tokens(rows):
+        for user, expense_id, _, category, _, description in rows:
+            for token in set(ExpenseSearchIndex.tokenize(f"{description} {category}")):
+                yield user, token, expense_id
+
+    def _insert_expenses(self, rows):
+        rows = iter(rows)
+        while True:
+            batch = [(self.username, int(exp['id']), parse_date(exp['date']).isoformat(), exp['category'],
+                      float(exp['amount']), exp['description'] or "")
+                     for exp in itertools.islice(rows, IMPORT_BATCH_ROWS)]
+            if not batch:
+                return
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO expenses (user, id, date, category, amount, description) "
+                "VALUES (?, ?, ?, ?, ?, ?)", batch)
+            self.conn.executemany("INSERT OR IGNORE INTO expense_tokens (user, token, id) VALUES (?, ?, ?)",
+                                  self._tokens(batch))
+
+    def _insert_sips(self, rows):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO sips (user, id, name, amount, category, frequency, start_date) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((self.username, sip['id'], sip['name'], sip['amount'], sip['category'], sip['frequency'],
+              sip['start_date']) for sip in rows))
+
+    def save(self):
+        # Nothing commits while an import's transaction is open; only finish_import may.
+        if self._importing:
+            return
+        if self.io is None:
+            self._commit()
+        else:
+            self.io.submit(self._commit, key=self)
+
+    def _commit(self):
+        with self._lock:
+            if not self._importing:
+                self.conn.commit()
+
+    def is_current(self):
+        return self.conn is not None
+
+    def nbytes(self):
+        # Expenses live in the database; only SIPs and goals are held in memory.
+        return 400 * len(self.sips) + 100 * len(self.goals)
+
+    def close(self):
+        if self.conn is not None:
+            self.save()
+            if self.io is not None:
+                self.io.flush()
+            self.conn.close()
+            self.conn = None
+
+    def export_rows(self):
+        return self.iter_expenses(), list(self.sips)
+
+    def _row(self, row):
+        return dict(zip(EXPENSE_FIELDS, row))
+
+    def add_expense(self, fields):
+        exp = dict(fields, id=self.next_expense_id)
+        self.next_expense_id += 1
+        with self._lock:
+            self._insert_expenses([exp])
+        self.save()
+        return exp
+
+    def get_expense(self, expense_id):
+        row = self.conn.execute(
+            "SELECT id, date, category, amount, description FROM expenses WHERE user = ? AND id = ?",
+            (self.username, expense_id)).fetchone()
+        return self._row(row) if row else None
+
+    def update_expenses(self, rows):
+        params = [(parse_date(exp['date']).isoformat(), exp['category'], float(exp['amount']),
+                   exp['description'] or "", self.username, exp['id']) for exp in rows]
+        with self._lock:
+            self.conn.executemany(
+                "UPDATE expenses SET date = ?, category = ?, amount = ?, description = ? WHERE user = ? AND id = ?",
+                params)
+            self.conn.executemany("DELETE FROM expense_tokens WHERE user = ? AND id = ?",
+                                  ((user, expense_id) for *_, user, expense_id in params))
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO expense_tokens (user, token, id) VALUES (?, ?, ?)",
+                self._tokens((user, expense_id, day, category, amount, description)
+                             for day, category, amount, description, user, expense_id in params))
+        self.save()
+
+    def remove_expenses(self, expense_ids):
+        removed = [exp for exp in map(self.get_expense, expense_ids) if exp]
+        with self._lock:
+            self.conn.executemany("DELETE FROM expenses WHERE user = ? AND id = ?",
+                                  ((self.username, exp['id']) for exp in removed))
+            self.conn.executemany("DELETE FROM expense_tokens WHERE user = ? AND id = ?",
+                                  ((self.username, exp['id']) for exp in removed))
+        self.save()
+        return removed
+
+    def iter_expenses(self):
+        cursor = self.conn.execute(
+            "SELECT id, date, category, amount, description FROM expenses WHERE user = ? ORDER BY id",
+            (self.username,))
+        for row in cursor:
+            yield self._row(row)
+
+    def expense_count(self):
+        count = self.conn.execute("SELECT SUM(count) FROM expense_rollup WHERE user = ?",
+                                  (self.username,)).fetchone()[0]
+        return count or 0
+
+    def _filters(self, year, month, search):
+        clauses = ["user = ?"]
+        params = [self.username]
+        if year is not None:
+            first, last = (month or 1), (month or 12)
+            end = f"{year + 1:04d}-01-01" if last == 12 else f"{year:04d}-{last + 1:02d}-01"
+            clauses.append("date >= ? AND date < ?")
+            params += [f"{year:04d}-{first:02d}-01", end]
+        elif month is not None:
+            clauses.append("substr(date, 6, 2) = ?")
+            params.append(f"{month:02d}")
+        # Every term must prefix one of the expense's tokens, as in ExpenseSearchIndex; a
+        # prefix is the token range [term, term + U+10FFFF).
+        for term in ExpenseSearchIndex.tokenize(search):
+            clauses.append("id IN (SELECT id FROM expense_tokens WHERE user = ? AND token >= ? AND token < ?)")
+            params += [self.username, term, term + "\U0010ffff"]
+        return " AND ".join(clauses), params
+
+    def query_expenses(self, year=None, month=None, search=""):
+        where, params = self._filters(year, month, search)
+        total = self.conn.execute(f"SELECT COUNT(*) FROM expenses WHERE {where}", params).fetchone()[0]
+        return self._newest_first(where, params), total
+
+    def _newest_first(self, where, params):
+        # Keyset pagination: each page is a fresh indexed query, so writes made while the
+        # history table is still pulling rows never invalidate an open cursor.
+        query = f"SELECT id, date, category, amount, description FROM expenses WHERE {where}"
+        rows = self.conn.execute(f"{query} ORDER BY date DESC, id DESC LIMIT ?",
+                                 params + [self.PAGE_SIZE]).fetchall()
+        while rows:
+            for row in rows:
+                yield self._row(row)
+            if len(rows) < self.PAGE_SIZE:
+                return
+            last_id, last_date = rows[-1][0], rows[-1][1]
+            rows = self.conn.execute(
+                f"{query} AND (date < ? OR (date = ? AND id < ?)) ORDER BY date DESC, id DESC LIMIT ?",
+                params + [last_date, last_date, last_id, self.PAGE_SIZE]).fetchall()
+
+    def expense_total(self):
+        total = self.conn.execute("SELECT SUM(amount) FROM expense_rollup WHERE user = ?",
+                                  (self.username,)).fetchone()[0]
+        return total or 0.0
+
+    def category_totals(self, month=None):
+        if month is None:
+            rows = self.conn.execute(
+                "SELECT category, SUM(amount) FROM expense_rollup WHERE user = ? GROUP BY category",
+                (self.username,))
+        else:
+            rows = self.conn.execute(
+                "SELECT category, amount FROM expense_rollup WHERE user = ? AND month = ?",
+                (self.username, month))
+        return dict(rows)
+
+    def month_total(self, month):
+        total = self.conn.execute("SELECT SUM(amount) FROM expense_rollup WHERE user = ? AND month = ?",
+                                  (self.username, month)).fetchone()[0]
+        return total or 0.0
+
+    def day_total(self, day):
+        total = self.conn.execute("SELECT SUM(amount) FROM expenses WHERE user = ? AND date = ?",
+                                  (self.username, day)).fetchone()[0]
+        return total or 0.0
+
+    def latest_expense(self):
+        row = self.conn.execute(
+            "SELECT id, date, category, amount, description FROM expenses WHERE user = ? "
+            "ORDER BY date DESC, id DESC LIMIT 1", (self.username,)).fetchone()
+        return self._row(row) if row else None
+
+    def month_category_rollup(self):
+        return self.conn.execute(
+            "SELECT month, category, amount, count FROM expense_rollup WHERE user = ? ORDER BY month, category",
+            (self.username,))
+
+    def month_category_matrix(self):
+        # Built from the trigger-maintained rollup table: one row per month and category.
+        matrix = MonthCategoryMatrix()
+        with self._lock:
+            for month, category, amount, _ in self.month_category_rollup():
+                matrix.set(month, category, amount)
+        return matrix
+
+    def add_sip(self, fields):
+        sip = dict(fields, id=self.next_sip_id)
+        self.next_sip_id += 1
+        self.sips.append(sip)
+        with self._lock:
+            self._insert_sips([sip])
+        self.save()
+        return sip
+
+    def remove_sips(self, sip_ids):
+        removed = [sip for sip in map(self.sips.remove, sip_ids) if sip]
+        with self._lock:
+            self.conn.executemany("DELETE FROM sips WHERE user = ? AND id = ?",
+                                  ((self.username, sip['id']) for sip in removed))
+        self.save()
+        return removed
+
+    def set_goals(self, goals):
+        self.goals = dict(goals)
+        with self._lock:
+            self.conn.execute("DELETE FROM goals WHERE user = ?", (self.username,))
+            self.conn.executemany("INSERT INTO goals (user, category, amount) VALUES (?, ?, ?)",
+                                  ((self.username, cat, amt) for cat, amt in self.goals.items()))
+        self.save()
+
+    # An import runs as one transaction that finish_import commits and abort_import rolls back.
+    def begin_import(self, merge):
+        # Commits already queued must land before the import's transaction opens.
+        if self.io is not None:
+            self.io.flush()
+        self._importing = True
+        if not merge:
+            with self._lock:
+                self.conn.execute("DELETE FROM expenses WHERE user = ?", (self.username,))
+                self.conn.execute("DELETE FROM expense_tokens WHERE user = ?", (self.username,))
+                self.conn.execute("DELETE FROM sips WHERE user = ?", (self.username,))
+            self.sips = SipLedger()
+            self.next_expense_id = 1
+            self.next_sip_id = 1
+
+    def import_rows(self, expenses, sips, remap):
+        taken = set()
+        if not remap and expenses:
+            ids = [exp['id'] for exp in expenses]
+            taken.update(row[0] for row in self.conn.execute(
+                f"SELECT id FROM expenses WHERE user = ? AND id IN ({','.join('?' * len(ids))})",
+                [self.username] + ids))
+        for exp in expenses:
+            if remap or exp['id'] in taken:
+                exp['id'] = self.next_expense_id
+            self.next_expense_id = max(self.next_expense_id, exp['id'] + 1)
+            taken.add(exp['id'])
+        for sip in sips:
+            if remap or sip['id'] in self.sips:
+                sip['id'] = self.next_sip_id
+            self.next_sip_id = max(self.next_sip_id, sip['id'] + 1)
+            self.sips.append(sip)
+        with self._lock:
+            self._insert_expenses(expenses)
+            self._insert_sips(sips)
+
+    def finish_import(self):
+        self._importing = False
+        self.save()
+
+    def abort_import(self):
+        self._importing = False
+        if self.io is not None:
+            self.io.flush()
+        with self._lock:
+            self.conn.rollback()
+        self.load()
+
+
+STORAGE_BACKENDS = {"csv": CsvLedgerStore, "binary": BinaryLedgerStore, "sqlite": SqliteLedgerStore}
+
+
+def monthly_budget_alert(spent, budget):
+    if budget <= 0:
+        return None
+    percentage = (spent / budget) * 100
+    if percentage >= 100:
+        return ("Monthly Budget Exceeded",
+                f"❌ You've exceeded your monthly budget!\n"
+                f"Spent: ₹{spent:,.2f}\nBudget: ₹{budget:,.2f}",
+                "danger")
+    if percentage >= 90:
+        return ("Monthly Budget Warning",
+                f"🚨 You've spent {percentage:.1f}% of your monthly budget!\n"
+                f"Spent: ₹{spent:,.2f}\nBudget: ₹{budget:,.2f}",
+                "warning")
+    return None
+
+
+def daily_budget_alert(spent, budget):
+    if budget > 0 and spent > budget:
+        return ("Daily Budget Exceeded",
+                f"⚠️ Today's spending exceeds your daily budget!\n"
+                f"Spent: ₹{spent:,.2f}\nBudget: ₹{budget:,.2f}",
+                "warning")
+    return None
+
+
+def category_budget_alert(category, spent, goal):
+    if spent > goal and goal > 0:
+        return ("Category Budget Alert",
+                f"🚨 {category} spending exceeded!\n"
+                f"Spent: ₹{spent:,.2f}\nGoal: ₹{goal:,.2f}",
+                "warning")
+    return None
+
+
+def budget_alerts(store, monthly_budget, daily_budget, today=None):
+    # Returns (title, message, level) for every budget the store is over or close to;
+    # level names the theme colour the app shows it in.
+    today = today or date.today()
+    current_month = today.strftime("%Y-%m")
+    alerts = [monthly_budget_alert(store.month_total(current_month), monthly_budget),
+              daily_budget_alert(store.day_total(today.isoformat()), daily_budget)]
+    monthly_totals = store.category_totals(current_month)
+    for category, goal in store.goals.items():
+        alerts.append(category_budget_alert(category, monthly_totals.get(category, 0), goal))
+    return [alert for alert in alerts if alert is not None]
+
+
+class BudgetAlertEngine:
+    # Budget checks driven by what changed. touch() records the date and category of each
+    # added, edited or deleted expense, and evaluate() re-checks only the monthly, daily
+    # and category thresholds those feed, from the store's running totals. A threshold
+    # alerts once when crossed (again if it escalates from warning to exceeded) and re-arms
+    # when spending falls back below it or its budget changes.
+    LEVELS = {"warning": 1, "danger": 2}
+
+    def __init__(self):
+        self.everything = True
+        self.days = set()
+        self.categories = set()
+        self.fired = {}
+
+    def touch(self, day, category):
+        self.days.add(day)
+        self.categories.add(category)
+
+    def touch_all(self):
+        self.everything = True
+
+    def evaluate(self, store, monthly_budget, daily_budget, today=None):
+        today = today or date.today()
+        month, day = today.strftime("%Y-%m"), today.isoformat()
+        everything, days, categories = self.everything, self.days, self.categories
+        self.everything, self.days, self.categories = False, set(), set()
+        checks = []
+        month_touched = everything or any(touched.startswith(month) for touched in days)
+        if month_touched:
+            checks.append((('month', month, monthly_budget),
+                           lambda: monthly_budget_alert(store.month_total(month), monthly_budget)))
+            goals = store.goals if everything else {category: store.goals[category]
+                                                    for category in categories if category in store.goals}
+            if goals:
+                totals = store.category_totals(month)
+                for category, goal in goals.items():
+                    checks.append((('category', month, category, goal),
+                                   lambda category=category, goal=goal: category_budget_alert(
+                                       category, totals.get(category, 0), goal)))
+        if everything or day in days:
+            checks.append((('day', day, daily_budget), lambda: daily_budget_alert(store.day_total(day), daily_budget)))
+        # Thresholds from earlier periods can never fire again.
+        self.fired = {key: level for key, level in self.fired.items() if key[1] in (month, day)}
+        alerts = []
+        for key, check in checks:
+            alert = check()
+            if alert is None:
+                self.fired.pop(key, None)
+                continue
+            previous = self.fired.get(key)
+            self.fired[key] = alert[2]
+            if previous is None or self.LEVELS[alert[2]] > self.LEVELS[previous]:
+                alerts.append(alert)
+        return alerts
+
+
+class UserDirectory:
+    # users.csv held as a username -> password hash dict. Every lookup stats the file and
+    # reloads it only when its (mtime, size) changed, so edits by another process are
+    # picked up; our own signups update the dict and the recorded signature together.
+    def __init__(self, path="users.csv"):
+        self.path = path
+        self.hashes = {}
+        self.signature = None
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _current(self):
+        signature = self._stat()
+        if signature != self.signature:
+            hashes = {}
+            if signature is not None:
+                with open(self.path, mode='r', newline='') as file:
+                    reader = csv.reader(file)
+                    header = next(reader, [])
+                    if 'username' in header and 'password' in header:
+                        name_at, hash_at = header.index('username'), header.index('password')
+                        for row in reader:
+                            if len(row) == len(header):
+                                hashes.setdefault(row[name_at], row[hash_at])
+            self.hashes = hashes
+            self.signature = signature
+        return self.hashes
+
+    def __contains__(self, username):
+        return username in self._current()
+
+    def __iter__(self):
+        return iter(list(self._current()))
+
+    def __len__(self):
+        return len(self._current())
+
+    def verify(self, username, password_hash):
+        stored = self._current().get(username)
+        return stored is not None and stored == password_hash
+
+    def add(self, username, password_hash):
+        hashes = self._current()
+        new_file = self.signature is None
+        with open(self.path, mode='a', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=['username', 'password'])
+            if new_file:
+                writer.writeheader()
+            writer.writerow({'username': username, 'password': password_hash})
+        hashes[username] = password_hash
+        self.signature = self._stat()
+
+
+class UserLedgerCache:
+    # Per-user session state ({'store', 'monthly_budget', 'daily_budget'}) in least-recently
+    # used order. trim() closes (flushing) and drops the oldest users until the resident
+    # ledgers fit the byte budget; the user passed as keep is never evicted.
+    def __init__(self, budget=USER_CACHE_BYTES):
+        self.budget = budget
+        self.entries = OrderedDict()
+        self.evictions = 0
+
+    def __contains__(self, username):
+        return username in self.entries
+
+    def __getitem__(self, username):
+        return self.entries[username]
+
+    def __setitem__(self, username, entry):
+        self.entries[username] = entry
+        self.entries.move_to_end(username)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def touch(self, username):
+        self.entries.move_to_end(username)
+
+    def pop(self, username):
+        return self.entries.pop(username, None)
+
+    def nbytes(self):
+        return sum(entry['store'].nbytes() for entry in self.entries.values())
+
+    def trim(self, keep=None):
+        sizes = {username: entry['store'].nbytes() for username, entry in self.entries.items()}
+        resident = sum(sizes.values())
+        for username in list(self.entries):
+            if resident <= self.budget:
+                break
+            if username == keep:
+                continue
+            self.entries.pop(username)['store'].close()
+            resident -= sizes[username]
+            self.evictions += 1
+
+    def close(self):
+        for entry in self.entries.values():
+            entry['store'].close()
+
+
+class LedgerEngine:
+    # The ledger without Tk, for cron jobs and the command line: opens one user's store at
+    # a time, ingests export files in streamed batches, and yields rollups and budget alerts
+    # as it goes so output starts before the last user is read.
+    def __init__(self, storage="csv", users_file="users.csv"):
+        self.storage = storage
+        self.users_file = users_file
+
+    def users(self):
+        return iter(UserDirectory(self.users_file))
+
+    def open(self, username):
+        store = STORAGE_BACKENDS[self.storage](username)
+        store.load()
+        return store
+
+    def ingest(self, username, paths, merge=True, on_bad_row=None):
+        store = self.open(username)
+        imported = bad = 0
+        try:
+            store.begin_import(merge)
+            for path in paths:
+                for expenses, sips, bad_rows, _ in read_import_batches(path):
+                    store.import_rows(expenses, sips, remap=merge)
+                    imported += len(expenses) + len(sips)
+                    bad += len(bad_rows)
+                    if on_bad_row is not None:
+                        for line, reason in bad_rows:
+                            on_bad_row(path, line, reason)
+            store.finish_import()
+        except BaseException:
+            store.abort_import()
+            raise
+        finally:
+            store.close()
+        return imported, bad
+
+    def rollups(self, usernames, month=None):
+        for username in usernames:
+            store = self.open(username)
+            try:
+                for row in store.month_category_rollup():
+                    if month is None or row[0] == month:
+                        yield (username,) + tuple(row)
+            finally:
+                store.close()
+
+    def alerts(self, usernames, monthly_budget=0.0, daily_budget=0.0, today=None):
+        for username in usernames:
+            store = self.open(username)
+            try:
+                for title, message, level in budget_alerts(store, monthly_budget, daily_budget, today):
+                    yield username, level, title, message
+            finally:
+                store.close()
+
+
+def run_cli(args):
+    engine = LedgerEngine(args.storage, args.users_file)
+    writer = csv.writer(sys.stdout)
+    if args.command == "ingest":
+        def report(path, line, reason):
+            print(f"{path}:{line}: skipped: {reason}", file=sys.stderr)
+        imported, bad = engine.ingest(args.user, args.files, merge=not args.replace, on_bad_row=report)
+        print(f"{args.user}: {imported:,} rows imported, {bad:,} skipped", file=sys.stderr)
+        return 0
+    usernames = args.users or list(engine.users())
+    if args.command == "rollup":
+        writer.writerow(["user", "month", "category", "amount", "count"])
+        for username, month, category, amount, count in engine.rollups(usernames, args.month):
+            writer.writerow([username, month, category, f"{amount:.2f}", count])
+        return 0
+    today = parse_date(args.date) if args.date else None
+    writer.writerow(["user", "level", "title", "message"])
+    alerts = 0
+    for username, level, title, message in engine.alerts(usernames, args.monthly_budget, args.daily_budget, today):
+        writer.writerow([username, level, title, " ".join(message.split("\n"))])
+        alerts += 1
+    return 1 if alerts and args.fail_on_alert else 0
+
+
+class RefreshScheduler:
+    # Mutations mark views dirty instead of refreshing them; one after_idle pass per turn of
+    # the event loop then refreshes each dirty view that is on screen, so a burst of edits
+    # costs one refresh per view. Off-screen views stay dirty until show_frame asks for them.
+    def __init__(self, root, views, is_visible):
+        self.root = root
+        self.views = views
+        self.is_visible = is_visible
+        self.dirty = set()
+        self.after_id = None
+        self.counters = {'marked': 0, 'coalesced': 0, 'deferred': 0, 'passes': 0, 'refreshed': 0}
+
+    def mark(self, *names):
+        for name in names:
+            self.counters['marked'] += 1
+            if name in self.dirty:
+                self.counters['coalesced'] += 1
+            self.dirty.add(name)
+        if self.after_id is None:
+            self.after_id = self.root.after_idle(self.run)
+
+    def run(self):
+        self.after_id = None
+        self.counters['passes'] += 1
+        for name, refresh in self.views.items():
+            if name not in self.dirty:
+                continue
+            if not self.is_visible(name):
+                self.counters['deferred'] += 1
+                continue
+            self.dirty.discard(name)
+            self.counters['refreshed'] += 1
+            refresh()
+
+    def refresh(self, name, force=False):
+        if force or name in self.dirty:
+            self.dirty.discard(name)
+            self.counters['refreshed'] += 1
+            self.views[name]()
+
+    def cancel(self):
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+        self.dirty.clear()
+
+
+class StallWatchdog:
+    # A heartbeat scheduled with root.after and checked from a daemon thread. When the
+    # mainloop misses it for longer than the threshold, the main thread's stack is captured
+    # with sys._current_frames and logged with the innermost method of the owning class on
+    # it; a second line gives the full stall length once the mainloop recovers.
+    def __init__(self, root, owner, threshold=STALL_THRESHOLD_S, log_file=STALL_LOG_FILE, profiler=None):
+        self.root = root
+        self.threshold = threshold
+        self.profiler = profiler
+        self.methods = {func.__code__: f"{owner.__name__}.{name}"
+                        for name, func in vars(owner).items() if isinstance(func, types.FunctionType)}
+        self.main_ident = threading.get_ident()
+        self.last_beat = time.perf_counter()
+        self.stall = None
+        self.stopped = threading.Event()
+        self.log = logging.getLogger("exchequer.stalls")
+        self.log.propagate = False
+        self.log.setLevel(logging.WARNING)
+        if not self.log.handlers:
+            handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=PROFILE_LOG_BYTES,
+                                                           backupCount=PROFILE_LOG_BACKUPS, delay=True)
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            self.log.addHandler(handler)
+        self.after_id = self.root.after(STALL_BEAT_MS, self.beat)
+        self.thread = threading.Thread(target=self._watch, name="exchequer-watchdog", daemon=True)
+        self.thread.start()
+
+    def beat(self):
+        self.last_beat = time.perf_counter()
+        self.after_id = self.root.after(STALL_BEAT_MS, self.beat)
+
+    def _watch(self):
+        while not self.stopped.wait(self.threshold / 4):
+            now = time.perf_counter()
+            # The beat is due every STALL_BEAT_MS, so lateness beyond that is the stall.
+            late = now - self.last_beat - STALL_BEAT_MS / 1000
+            if self.stall is None and late > self.threshold:
+                self._capture(now - late)
+            elif self.stall is not None and self.stall['beat'] != self.last_beat:
+                self._recovered(self.last_beat)
+
+    def _capture(self, start):
+        frame = sys._current_frames().get(self.main_ident)
+        if frame is None:
+            return
+        method = None
+        walker = frame
+        while walker is not None and method is None:
+            method = self.methods.get(walker.f_code)
+            walker = walker.f_back
+        stack = "".join(traceback.format_stack(frame))
+        del frame, walker
+        self.stall = {'start': start, 'beat': self.last_beat, 'method': method or "unknown"}
+        self.log.warning(f"UI stalled for over {self.threshold:.1f}s in {self.stall['method']}\n{stack}")
+
+    def _recovered(self, resumed):
+        stall, self.stall = self.stall, None
+        duration = resumed - stall['start']
+        self.log.warning(f"UI stall in {stall['method']} ended after {duration:.2f}s")
+        if self.profiler is not None and self.profiler.enabled:
+            self.profiler.record(f"stall.{stall['method']}", stall['start'], duration, 0)
+
+    def stop(self):
+        self.stopped.set()
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+
+
+class Chart:
+    # Base for the Statistics charts: one figure on one canvas, where tight_layout is
+    # recomputed only after a rebuild or resize and drawing is left to draw_idle.
+    def __init__(self, fig, canvas):
+        self.fig = fig
+        self.canvas = canvas
+        self.layout_dirty = True
+        canvas.mpl_connect('resize_event', self.on_resize)
+
+    def on_resize(self, event):
+        self.layout_dirty = True
+
+    def restyle(self, face, edge, text):
+        # Axes keep the face and spine colours they were created with, even across
+        # ax.clear(), so a theme change recolours them here.
+        self.fig.patch.set_facecolor(face)
+        for ax in self.fig.axes:
+            ax.set_facecolor(face)
+            for spine in ax.spines.values():
+                spine.set_edgecolor(edge)
+            ax.tick_params(colors=text)
+        self.layout_dirty = True
+
+    def draw(self):
+        if self.layout_dirty:
+            self.fig.tight_layout()
+            self.layout_dirty = False
+        self.canvas.draw_idle()
+
+
+class StatsCharts(Chart):
+    # The Statistics pie and bar charts. While the category sets stay the same an update
+    # only moves the existing wedges, labels and bars and asks for draw_idle; the axes are
+    # rebuilt, and tight_layout recomputed, only when the categories or theme change.
+    def __init__(self, fig, canvas):
+        super().__init__(fig, canvas)
+        self.pie_ax, self.bar_ax = fig.subplots(1, 2)
+        self.pie = None
+        self.bars = None
+
+    def render(self, cat_totals, sip_totals, text_color, bar_color, cmap, rebuild=False):
+        no_data = not cat_totals and not sip_totals
+        rebuilt = self._render_pie(cat_totals, no_data, text_color, cmap, rebuild)
+        rebuilt = self._render_bars(sip_totals, no_data, text_color, bar_color, rebuild) or rebuilt
+        self.layout_dirty = self.layout_dirty or rebuilt
+        self.draw()
+
+    def _render_pie(self, cat_totals, no_data, text_color, cmap, rebuild):
+        categories = tuple(cat_totals)
+        amounts = [cat_totals[cat] for cat in categories]
+        if not rebuild and self.pie is not None and self.pie[0] == (categories, no_data):
+            _, wedges, labels, percents = self.pie
+            total = sum(amounts)
+            # Same geometry pie() uses: counter-clockwise from 90 degrees, labels at 1.1r
+            # and percentages at 0.6r of the unit circle.
+            theta = 90.0
+            for wedge, label, percent, amount in zip(wedges, labels, percents, amounts):
+                sweep = 360.0 * amount / total
+                wedge.set_theta1(theta)
+                wedge.set_theta2(theta + sweep)
+                middle = math.radians(theta + sweep / 2)
+                x, y = math.cos(middle), math.sin(middle)
+                label.set_position((1.1 * x, 1.1 * y))
+                label.set_horizontalalignment('left' if x > 0 else 'right')
+                percent.set_position((0.6 * x, 0.6 * y))
+                percent.set_text(f"{100.0 * amount / total:1.1f}%")
+                theta += sweep
+            return False
+        self.pie_ax.clear()
+        wedges, labels, percents = [], [], []
+        if no_data:
+            self.pie_ax.text(0.5, 0.5, "No data", ha="center", va="center", fontsize=10, color=text_color)
+        elif categories:
+            colors = cmap([i / float(len(categories)) for i in range(len(categories))])
+            wedges, labels, percents = self.pie_ax.pie(
+                amounts, labels=categories, autopct="%1.1f%%", startangle=90,
+                colors=colors, textprops={'color': text_color, 'fontsize': 8})
+            self.pie_ax.set_title("Expenses by Category", color=text_color, fontsize=10)
+        self.pie = ((categories, no_data), wedges, labels, percents)
+        return True
+
+    def _render_bars(self, sip_totals, no_data, text_color, bar_color, rebuild):
+        categories = tuple(sip_totals)
+        if not rebuild and self.bars is not None and self.bars[0] == (categories, no_data):
+            for bar, cat in zip(self.bars[1], categories):
+                bar.set_height(sip_totals[cat])
+            self.bar_ax.relim()
+            self.bar_ax.autoscale_view()
+            return False
+        self.bar_ax.clear()
+        bars = []
+        if no_data:
+            self.bar_ax.text(0.5, 0.5, "No data", ha="center", va="center", fontsize=10, color=text_color)
+        elif categories:
+            bars = self.bar_ax.bar(categories, [sip_totals[cat] for cat in categories], color=bar_color)
+            self.bar_ax.set_title("SIP by Category", color=text_color, fontsize=10)
+            self.bar_ax.tick_params(axis="x", rotation=45, colors=text_color)
+            self.bar_ax.tick_params(axis="y", colors=text_color)
+        self.bars = ((categories, no_data), bars)
+        return True
+
+
+class SipProjectionChart(Chart):
+    # Projected SIP portfolio value against money invested over the horizon, one line per
+    # assumed return. Updates move the existing lines; they are rebuilt only when the
+    # rates, horizon or theme change.
+    def __init__(self, fig, canvas):
+        super().__init__(fig, canvas)
+        self.ax = fig.subplots()
+        self.lines = None
+
+    def render(self, projection, text_color, invested_color, cmap, rebuild=False):
+        years = projection.months / 12
+        title = (f"Invested to date ₹{projection.invested_to_date:,.0f} · "
+                 f"₹{projection.monthly_outflow:,.0f} per month")
+        shape = (projection.rates, len(years))
+        if not rebuild and self.lines is not None and self.lines[0] == shape:
+            _, invested_line, value_lines = self.lines
+            invested_line.set_ydata(projection.invested)
+            for line, values in zip(value_lines, projection.values):
+                line.set_ydata(values)
+            self.ax.set_title(title, color=text_color, fontsize=10)
+            self.ax.relim()
+            self.ax.autoscale_view()
+        else:
+            self.ax.clear()
+            colors = cmap([0.3 + 0.5 * i / max(1, len(projection.rates) - 1)
+                           for i in range(len(projection.rates))])
+            value_lines = [self.ax.plot(years, values, color=color, label=f"Value at {rate:.0%}")[0]
+                           for rate, values, color in zip(projection.rates, projection.values, colors)]
+            invested_line = self.ax.plot(years, projection.invested, color=invested_color,
+                                         linestyle="--", label="Invested")[0]
+            self.ax.set_title(title, color=text_color, fontsize=10)
+            self.ax.set_xlabel("Years from today", color=text_color, fontsize=8)
+            self.ax.tick_params(colors=text_color, labelsize=8)
+            self.ax.yaxis.set_major_formatter(lambda value, pos: f"₹{value:,.0f}")
+            self.ax.legend(fontsize=8, labelcolor=text_color, frameon=False)
+            self.lines = (shape, invested_line, value_lines)
+            self.layout_dirty = True
+        self.draw()
+
+
+def month_ticks(months):
+    # Year labels on each January once the range spans a couple of years, else about six months.
+    januaries = [i for i, month in enumerate(months) if month.endswith("-01")]
+    if len(januaries) >= 2:
+        return januaries, [months[i][:4] for i in januaries]
+    positions = list(range(0, len(months), max(1, len(months) // 6)))
+    return positions, [months[i] for i in positions]
+
+
+class MonthlyTrendChart(Chart):
+    # Monthly spending stacked by category, with the month-over-month change in total below.
+    # The stack is redrawn on each update without clearing the axes; the change bars are
+    # reused while the month range stays the same.
+    def __init__(self, fig, canvas):
+        super().__init__(fig, canvas)
+        self.stack_ax, self.delta_ax = fig.subplots(2, 1, sharex=True, gridspec_kw={'height_ratios': [3, 1]})
+        self.stack = []
+        self.bars = None
+
+    def render(self, months, columns, text_color, up_color, down_color, cmap, rebuild=False):
+        totals = [sum(amounts) for amounts in zip(*columns.values())]
+        deltas = [0.0] + [current - previous for previous, current in zip(totals, totals[1:])]
+        shape = (tuple(months), tuple(columns))
+        if rebuild or self.bars is None or self.bars[0] != shape:
+            for ax in (self.stack_ax, self.delta_ax):
+                ax.clear()
+                ax.tick_params(colors=text_color, labelsize=8)
+            self.stack = []
+            x = range(len(months))
+            bars = self.delta_ax.bar(x, deltas, width=0.8)
+            self.bars = (shape, bars)
+            self.delta_ax.axhline(0, color=text_color, linewidth=0.5)
+            self.delta_ax.set_ylabel("Change", color=text_color, fontsize=8)
+            self.delta_ax.set_xticks(*month_ticks(months))
+            self.stack_ax.set_title("Monthly Spending by Category", color=text_color, fontsize=10)
+            self.layout_dirty = True
+        for collection in self.stack:
+            collection.remove()
+        if months:
+            colors = cmap([i / float(len(columns)) for i in range(len(columns))])
+            self.stack = self.stack_ax.stackplot(range(len(months)), *columns.values(),
+                                                 labels=list(columns), colors=colors)
+            if self.layout_dirty:
+                self.stack_ax.legend(fontsize=7, labelcolor=text_color, frameon=False, loc="upper left", ncol=4)
+        else:
+            self.stack = []
+        for bar, delta in zip(self.bars[1], deltas):
+            bar.set_height(delta)
+            bar.set_color(up_color if delta > 0 else down_color)
+        for ax in (self.stack_ax, self.delta_ax):
+            ax.relim()
+            ax.autoscale_view()
+        self.draw()
+
+
+class CategoryShareChart(Chart):
+    # Each category's share of monthly spending over time as a 100% stack.
+    def __init__(self, fig, canvas):
+        super().__init__(fig, canvas)
+        self.ax = fig.subplots()
+        self.stack = []
+        self.shape = None
+
+    def render(self, months, columns, text_color, cmap, rebuild=False):
+        totals = [sum(amounts) for amounts in zip(*columns.values())]
+        shares = [[100.0 * amount / total if total > 0 else 0.0 for amount, total in zip(amounts, totals)]
+                  for amounts in columns.values()]
+        shape = (tuple(months), tuple(columns))
+        if rebuild or self.shape != shape:
+            self.ax.clear()
+            self.stack = []
+            self.ax.tick_params(colors=text_color, labelsize=8)
+            self.ax.set_ylim(0, 100)
+            self.ax.yaxis.set_major_formatter(lambda value, pos: f"{value:.0f}%")
+            self.ax.set_xticks(*month_ticks(months))
+            self.ax.set_title("Category Share of Monthly Spending", color=text_color, fontsize=10)
+            self.shape = shape
+            self.layout_dirty = True
+        for collection in self.stack:
+            collection.remove()
+        self.stack = []
+        if months:
+            colors = cmap([i / float(len(columns)) for i in range(len(columns))])
+            self.stack = self.ax.stackplot(range(len(months)), *shares, labels=list(columns), colors=colors)
+            if self.layout_dirty:
+                self.ax.legend(fontsize=7, labelcolor=text_color, frameon=False, loc="upper left", ncol=4)
+            self.ax.set_xlim(0, max(1, len(months) - 1))
+        self.draw()
+
+
+class VirtualTreeview:
+    # Drives a ttk.Treeview as a window onto a (possibly lazy) row source: only the rows
+    # in the viewport plus a small buffer exist as Tk items, and those items are reused
+    # as the scrollbar moves. Rows are pulled from the source only as far as scrolled.
+    def __init__(self, tree, scrollbar, format_row, key=None, buffer=5, rowheight=25):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.format_row = format_row
+        self.key = key or (lambda row: row['id'])
+        self.buffer = buffer
+        self.rowheight = rowheight
+        self.rows = []
+        self.source = iter(())
+        self.total = 0
+        self.exhausted = True
+        self.offset = 0
+        self.page = 20
+        self.items = []
+        self.visible = {}
+        self.selected = set()
+        self._rendering = False
+        scrollbar.configure(command=self.yview)
+        tree.bind("<Configure>", self.on_resize)
+        tree.bind("<MouseWheel>", self.on_mousewheel)
+        tree.bind("<Button-4>", lambda e: self.scroll(-3))
+        tree.bind("<Button-5>", lambda e: self.scroll(3))
+        tree.bind("<<TreeviewSelect>>", self.on_select, add="+")
+        # A plain click replaces the selection, including rows scrolled out of view;
+        # Ctrl/Shift clicks extend it and must not reach that handler.
+        tree.bind("<Button-1>", lambda e: self.tree.identify_row(e.y) and self.selected.clear())
+        tree.bind("<Control-Button-1>", lambda e: None)
+        tree.bind("<Shift-Button-1>", lambda e: None)
+        tree.bind("<Control-a>", lambda e: self.select_all() or "break")
+        tree.bind("<Down>", lambda e: self.on_arrow(1))
+        tree.bind("<Up>", lambda e: self.on_arrow(-1))
+        tree.bind("<Next>", lambda e: self.scroll(self.page) or "break")
+        tree.bind("<Prior>", lambda e: self.scroll(-self.page) or "break")
+
+    def set_source(self, rows, total=None, reset=True):
+        self.source = iter(rows)
+        self.rows = []
+        self.total = total
+        self.exhausted = False
+        if reset:
+            self.offset = 0
+            self.selected.clear()
+        self.render()
+
+    def _fetch(self, count=None):
+        # With no count the rest of the source is drained.
+        if count is None:
+            if not self.exhausted:
+                self.rows.extend(self.source)
+                self.exhausted = True
+            return
+        while not self.exhausted and len(self.rows) < count:
+            chunk = list(itertools.islice(self.source, max(count - len(self.rows), self.page)))
+            if not chunk:
+                self.exhausted = True
+            self.rows.extend(chunk)
+
+    def _estimated_total(self):
+        if self.total is not None:
+            return self.total
+        return len(self.rows) + (0 if self.exhausted else self.page)
+
+    def render(self):
+        self._fetch(self.offset + self.page + self.buffer)
+        self.offset = max(0, min(self.offset, len(self.rows) - self.page))
+        window = self.rows[self.offset:self.offset + self.page + self.buffer]
+        self._rendering = True
+        while len(self.items) < len(window):
+            self.items.append(self.tree.insert("", "end"))
+        if len(self.items) > len(window):
+            self.tree.delete(*self.items[len(window):])
+            del self.items[len(window):]
+        self.visible = {}
+        selection = []
+        for item, row in zip(self.items, window):
+            self.tree.item(item, values=self.format_row(row))
+            key = self.key(row)
+            self.visible[item] = key
+            if key in self.selected:
+                selection.append(item)
+        self.tree.selection_set(selection)
+        self.tree.yview_moveto(0)
+        self._rendering = False
+        total = max(self._estimated_total(), 1)
+        self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.page) / total))
+
+    def yview(self, *args):
+        if args[0] == "moveto":
+            total = self._estimated_total()
+            self.offset = int(float(args[1]) * total)
+            if self.total is None and self.offset + self.page >= total:
+                # Dragging to the end of an open-ended source pulls in another page.
+                self._fetch(self.offset + 2 * self.page)
+            self.render()
+        elif args[0] == "scroll":
+            step = int(args[1]) * (self.page if args[2] == "pages" else 1)
+            self.scroll(step)
+
+    def scroll(self, step):
+        self.offset = max(0, self.offset + step)
+        self.render()
+
+    def on_mousewheel(self, event):
+        self.scroll(-3 if event.delta > 0 else 3)
+        return "break"
+
+    def on_arrow(self, step):
+        focus = self.tree.focus()
+        if focus not in self.visible:
+            return None
+        index = self.items.index(focus) + step
+        if 0 <= index < min(self.page, len(self.items)):
+            return None
+        self.scroll(step)
+        item = self.items[max(0, min(index - step, len(self.items) - 1))]
+        self.tree.focus(item)
+        self.tree.selection_set(item)
+        return "break"
+
+    def on_resize(self, event):
+        page = max(1, (event.height - self.rowheight) // self.rowheight)
+        if page != self.page:
+            self.page = page
+            self.render()
+
+    def selection(self):
+        return set(self.selected)
+
+    def clear_selection(self):
+        self.selected.clear()
+        self.tree.selection_set([])
+
+    def select_all(self):
+        self._fetch()
+        self.selected = {self.key(row) for row in self.rows}
+        self.render()
+
+    def key_at(self, item):
+        return self.visible.get(item)
+
+    def on_select(self, event=None):
+        if self._rendering:
+            return
+        current = set(self.tree.selection())
+        for item, key in self.visible.items():
+            if item in current:
+                self.selected.add(key)
+            else:
+                self.selected.discard(key)
+
 
 class ModernExpenseTracker:
-    def __init__(self, root):
+    def __init__(self, root, storage="csv", prewarm=True, profile=None, stall_threshold=STALL_THRESHOLD_S,
+                 cache_bytes=USER_CACHE_BYTES, users_file="users.csv"):
         self.root = root
         self.root.title("💰 Exchequer")
         self.root.geometry("1000x600")
@@ -28,7 +2736,8 @@ class ModernExpenseTracker:
             "highlight": "#6c5ce7",
             "info": "#00bcd4",
             "button_text": "#ffffff",
-            "shadow": "#1a1a2a"
+            "shadow": "#1a1a2a",
+            "entry": "#3a3a4a"
         }
 
         self.light_colors = {
@@ -44,7 +2753,8 @@ class ModernExpenseTracker:
             "highlight": "#6c5ce7",
             "info": "#00bcd4",
             "button_text": "#ffffff",
-            "shadow": "#e0e0e0"
+            "shadow": "#e0e0e0",
+            "entry": "#e0e0e0"
         }
 
         self.themes = {"dark": self.dark_colors, "light": self.light_colors}
@@ -60,17 +2770,73 @@ class ModernExpenseTracker:
             "button": ("Segoe UI", 11, "bold")
         }
 
+        self.month_names = [datetime(2000, m, 1).strftime("%B") for m in range(1, 13)]
         self.categories = ["Food", "Transport", "Shopping", "Bills", "Entertainment", "Health", "Education", "Other"]
         self.sip_categories = ["Mutual Fund", "Stocks", "ETF", "Fixed Deposit", "Other"]
-        self.users_file = "users.csv"
+        self.users_file = users_file
+        self.user_directory = UserDirectory(self.users_file)
         self.current_user = None
-        self.user_data = {}
-        self.next_expense_id = 1
-        self.next_sip_id = 1
+        self.user_data = UserLedgerCache(cache_bytes)
+        self.storage = storage
+        self.search_after_id = None
+        self.import_job = None
+        self.alert_window = None
+        # Screens are built on first visit by show_frame and kept until logout.
+        self.screens = {
+            "main": (self.create_main_frame, "main_frame"),
+            "add_expense": (self.create_add_expense_frame, "add_expense_frame"),
+            "view_expenses": (self.create_view_expenses_frame, "view_expenses_frame"),
+            "stats": (self.create_stats_frame, "stats_frame"),
+            "settings": (self.create_settings_frame, "settings_frame"),
+            "sip_tracker": (self.create_sip_tracker_frame, "sip_tracker_frame"),
+            "view_sips": (self.create_view_sips_frame, "view_sips_frame"),
+            "budget": (self.create_budget_frame, "budget_frame")
+        }
+        self.frames = {}
+        self.current_screen = None
+        # Statistics views, each with its own lazily built figure; restyled ones rebuild
+        # their artists on their next render.
+        self.stats_views = {"Overview": StatsCharts, "Monthly Trend": MonthlyTrendChart,
+                            "Category Share": CategoryShareChart, "SIP Projection": SipProjectionChart}
+        self.charts_restyle = set()
+        # Command callbacks and view refreshes report spans when profiling is on; wrapping
+        # the bound methods here covers every widget and the refresh scheduler alike.
+        self.profiler = Profiler()
+        if profile:
+            self.profiler.enable(profile)
+        for name in ("login", "signup", "logout", "open_session", "save_user_data", "show_frame",
+                     "save_expense", "save_sip", "save_budget", "edit_expense", "delete_expense",
+                     "recategorize_expenses", "delete_sip", "run_search", "export_data", "import_data",
+                     "apply_import_batches", "finish_import", "change_theme", "change_stats_view",
+                     "toggle_profiling", "switch_account", "update_dashboard", "update_expenses_table",
+                     "update_sip_table", "render_charts", "check_budget_alerts"):
+            setattr(self, name, self.profiler.wrap(name, getattr(self, name)))
+        # Each refreshable view and the screen it lives on; alerts are not tied to a screen.
+        self.view_screens = {"dashboard": "main", "expenses": "view_expenses", "sips": "view_sips",
+                             "charts": "stats", "alerts": None}
+        self.refresh = RefreshScheduler(root, {
+            "dashboard": self.update_dashboard,
+            "expenses": self.update_expenses_table,
+            "sips": self.update_sip_table,
+            "charts": self.render_charts,
+            "alerts": self.check_budget_alerts
+        }, self.is_view_visible)
+        self.io = IOWorker(root, on_error=self.report_io_error, profiler=self.profiler)
+        self.watchdog = None
+        if stall_threshold:
+            self.watchdog = StallWatchdog(root, type(self), stall_threshold, profiler=self.profiler)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
         self.root.configure(bg=self.colors["background"])
         self.create_login_frame()
         self.login_frame.pack(fill="both", expand=True)
+        if prewarm:
+            self.root.after_idle(self.prewarm_charts)
+
+    def prewarm_charts(self):
+        # Import matplotlib while the user is typing their password; load_matplotlib's lock
+        # makes a Statistics visit that races this simply wait for it.
+        threading.Thread(target=load_matplotlib, name="matplotlib-prewarm", daemon=True).start()
 
     def create_button(self, parent, text, command, bg_color, small=False):
         btn_font = self.fonts["small"] if small else self.fonts["button"]
@@ -80,15 +2846,16 @@ class ModernExpenseTracker:
                         activebackground=self.darken_color(bg_color, 10),
                         activeforeground=self.colors["button_text"],
                         padx=12, pady=6, cursor="hand2")
-        btn.bind("<Enter>", lambda e: btn.config(bg=self.lighten_color(bg_color, 15), fg="white"))
-        btn.bind("<Leave>", lambda e: btn.config(bg=bg_color, fg=self.colors["button_text"]))
+        btn.base_bg = bg_color
+        btn.bind("<Enter>", lambda e: btn.config(bg=self.lighten_color(btn.base_bg, 15), fg="white"))
+        btn.bind("<Leave>", lambda e: btn.config(bg=btn.base_bg, fg=self.colors["button_text"]))
         return btn
 
     def create_entry(self, parent, row=None, column=None):
         entry_frame = tk.Frame(parent, bg=self.colors["card"])
         entry_frame.pack(fill="x", padx=5, pady=5)
         entry = tk.Entry(entry_frame, font=self.fonts["body"], bd=0,
-                        bg="#3a3a4a" if self.current_theme == "dark" else "#e0e0e0",
+                        bg=self.colors["entry"],
                         fg=self.colors["text"], insertbackground=self.colors["text"],
                         relief="flat")
         entry.pack(fill="x", padx=5, pady=5, ipady=6)
@@ -151,6 +2918,8 @@ class ModernExpenseTracker:
         self.root.after(2000, self.animate_welcome)
 
     def login(self):
+        if self.current_user is not None:
+            return
         username = self.username_entry.get()
         password = self.hash_password(self.password_entry.get())
         if not username or not password:
@@ -159,15 +2928,10 @@ class ModernExpenseTracker:
         if not os.path.exists(self.users_file):
             self.show_custom_message("ERROR", "No users registered yet. Please sign up first.", "error")
             return
-        with open(self.users_file, mode='r', newline='') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                if row['username'] == username and row['password'] == password:
-                    self.current_user = username
-                    self.initialize_user_data()
-                    self.login_frame.pack_forget()
-                    self.initialize_main_app()
-                    return
+        if self.user_directory.verify(username, password):
+            self.current_user = username
+            self.initialize_user_data(self.open_session)
+            return
         self.show_custom_message("ERROR", "Invalid username or password", "error")
 
     def signup(self):
@@ -176,21 +2940,10 @@ class ModernExpenseTracker:
         if not username or not password:
             self.show_custom_message("ERROR", "Please enter both username and password", "error")
             return
-        if os.path.exists(self.users_file):
-            with open(self.users_file, mode='r', newline='') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    if row['username'] == username:
-                        self.show_custom_message("ERROR", "Username already exists", "error")
-                        return
-        user_data = [{'username': username, 'password': password}]
-        fieldnames = ['username', 'password']
-        mode = 'a' if os.path.exists(self.users_file) else 'w'
-        with open(self.users_file, mode=mode, newline='') as file:
-            writer = csv.DictWriter(file, fieldnames=fieldnames)
-            if mode == 'w':
-                writer.writeheader()
-            writer.writerows(user_data)
+        if username in self.user_directory:
+            self.show_custom_message("ERROR", "Username already exists", "error")
+            return
+        self.user_directory.add(username, password)
         self.show_custom_message("SUCCESS", "Sign up successful! Please login.", "success")
         self.username_entry.delete(0, tk.END)
         self.password_entry.delete(0, tk.END)
@@ -198,76 +2951,49 @@ class ModernExpenseTracker:
     def hash_password(self, password):
         return hashlib.sha256(password.encode()).hexdigest()
 
-    def initialize_user_data(self):
-        if self.current_user not in self.user_data:
+    def initialize_user_data(self, on_loaded):
+        if self.current_user in self.user_data:
+            self.user_data.touch(self.current_user)
+            # A recently used ledger that nothing else has written to skips the reload.
+            if self.user_data[self.current_user]['store'].is_current():
+                on_loaded()
+                return
+        else:
             self.user_data[self.current_user] = {
-                'expenses': [],
-                'sips': [],
+                'store': STORAGE_BACKENDS[self.storage](self.current_user, io=self.io),
                 'monthly_budget': 0.0,
                 'daily_budget': 0.0,
-                'monthly_goals': {},
-                'csv_file': f"expenses_{self.current_user}.csv",
-                'sip_csv_file': f"sips_{self.current_user}.csv",
-                'goals_file': f"goals_{self.current_user}.csv"
+                'alerts': BudgetAlertEngine()
             }
-        self.load_user_data()
+        self.load_user_data(on_loaded)
 
-    def load_user_data(self):
-        user = self.user_data[self.current_user]
-        if os.path.exists(user['csv_file']):
-            with open(user['csv_file'], mode='r', newline='') as file:
-                reader = csv.DictReader(file)
-                user['expenses'] = []
-                for row in reader:
-                    row['amount'] = float(row['amount'])
-                    row['id'] = int(row['id'])
-                    user['expenses'].append(row)
-                self.next_expense_id = max([exp['id'] for exp in user['expenses']] + [0]) + 1
-        if os.path.exists(user['sip_csv_file']):
-            with open(user['sip_csv_file'], mode='r', newline='') as file:
-                reader = csv.DictReader(file)
-                user['sips'] = []
-                for row in reader:
-                    row['amount'] = float(row['amount'])
-                    row['id'] = int(row['id'])
-                    user['sips'].append(row)
-                self.next_sip_id = max([sip['id'] for sip in user['sips']] + [0]) + 1
-        if os.path.exists(user['goals_file']):
-            with open(user['goals_file'], mode='r', newline='') as file:
-                reader = csv.DictReader(file)
-                user['monthly_goals'] = {row['category']: float(row['amount']) for row in reader}
+    def load_user_data(self, on_loaded):
+        def loaded(result):
+            self.root.config(cursor="")
+            self.user_data.trim(keep=self.current_user)
+            on_loaded()
+
+        def failed(error):
+            self.root.config(cursor="")
+            self.user_data.pop(self.current_user)
+            self.current_user = None
+            self.show_custom_message("ERROR", f"Failed to load data: {str(error)}", "error")
+
+        self.root.config(cursor="watch")
+        self.io.submit(self.user_data[self.current_user]['store'].load, on_done=loaded, on_error=failed)
+
+    def open_session(self):
+        self.login_frame.pack_forget()
+        self.initialize_main_app()
 
     def save_user_data(self):
-        user = self.user_data[self.current_user]
-        with open(user['csv_file'], mode='w', newline='') as file:
-            fieldnames = ['id', 'date', 'category', 'amount', 'description']
-            writer = csv.DictWriter(file, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(user['expenses'])
-        with open(user['sip_csv_file'], mode='w', newline='') as file:
-            fieldnames = ['id', 'name', 'amount', 'category', 'frequency', 'start_date']
-            writer = csv.DictWriter(file, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(user['sips'])
-        with open(user['goals_file'], mode='w', newline='') as file:
-            fieldnames = ['category', 'amount']
-            writer = csv.DictWriter(file, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows([{'category': cat, 'amount': amt} for cat, amt in user['monthly_goals'].items()])
+        self.user_data[self.current_user]['store'].save()
 
     def initialize_main_app(self):
         self.create_nav_bar()
-        self.create_main_frame()
-        self.create_add_expense_frame()
-        self.create_view_expenses_frame()
-        self.create_stats_frame()
-        self.create_settings_frame()
-        self.create_sip_tracker_frame()
-        self.create_view_sips_frame()  # New frame for viewing SIPs
-        self.create_budget_frame()
-        self.show_frame(self.main_frame)
-        self.load_user_data()
-        self.check_budget_alerts()
+        self.show_frame("main")
+        self.user_data[self.current_user]['alerts'].touch_all()
+        self.refresh.mark("alerts")
 
     def create_nav_bar(self):
         self.nav_frame = tk.Frame(self.root, bg=self.colors["primary"], height=50)
@@ -278,7 +3004,7 @@ class ModernExpenseTracker:
         view_btn = self.create_nav_button(self.nav_frame, "👁️ View", self.show_view_menu)
         view_btn.pack(side="left", padx=5, pady=5)
         settings_btn = self.create_nav_button(self.nav_frame, "⚙️ Settings",
-                                             lambda: self.show_frame(self.settings_frame))
+                                             lambda: self.show_frame("settings"))
         settings_btn.pack(side="left", padx=5, pady=5)
 
         self.file_menu = tk.Menu(self.root, tearoff=0, bg=self.colors["card"], fg=self.colors["text"],
@@ -292,13 +3018,13 @@ class ModernExpenseTracker:
         self.view_menu = tk.Menu(self.root, tearoff=0, bg=self.colors["card"], fg=self.colors["text"],
                                 activebackground=self.colors["accent"], activeforeground="white",
                                 font=self.fonts["body"])
-        self.view_menu.add_command(label="📊 Dashboard", command=lambda: self.show_frame(self.main_frame))
-        self.view_menu.add_command(label="➕ Add Expense", command=lambda: self.show_frame(self.add_expense_frame))
-        self.view_menu.add_command(label="📋 View Expenses", command=lambda: self.show_frame(self.view_expenses_frame))
-        self.view_menu.add_command(label="📈 Statistics", command=lambda: self.show_frame(self.stats_frame))
-        self.view_menu.add_command(label="💹 Add SIP", command=lambda: self.show_frame(self.sip_tracker_frame))
-        self.view_menu.add_command(label="📜 View SIPs", command=lambda: self.show_frame(self.view_sips_frame))  # New option
-        self.view_menu.add_command(label="💸 Budget", command=lambda: self.show_frame(self.budget_frame))
+        self.view_menu.add_command(label="📊 Dashboard", command=lambda: self.show_frame("main"))
+        self.view_menu.add_command(label="➕ Add Expense", command=lambda: self.show_frame("add_expense"))
+        self.view_menu.add_command(label="📋 View Expenses", command=lambda: self.show_frame("view_expenses"))
+        self.view_menu.add_command(label="📈 Statistics", command=lambda: self.show_frame("stats"))
+        self.view_menu.add_command(label="💹 Add SIP", command=lambda: self.show_frame("sip_tracker"))
+        self.view_menu.add_command(label="📜 View SIPs", command=lambda: self.show_frame("view_sips"))  # New option
+        self.view_menu.add_command(label="💸 Budget", command=lambda: self.show_frame("budget"))
 
     def create_nav_button(self, parent, text, command):
         btn = tk.Button(parent, text=text, command=command,
@@ -307,8 +3033,9 @@ class ModernExpenseTracker:
                         activebackground=self.darken_color(self.colors["secondary"], 10),
                         activeforeground=self.colors["button_text"],
                         padx=10, pady=5, cursor="hand2")
-        btn.bind("<Enter>", lambda e: btn.config(bg=self.lighten_color(self.colors["secondary"], 15), fg="white"))
-        btn.bind("<Leave>", lambda e: btn.config(bg=self.colors["secondary"], fg=self.colors["button_text"]))
+        btn.base_bg = self.colors["secondary"]
+        btn.bind("<Enter>", lambda e: btn.config(bg=self.lighten_color(btn.base_bg, 15), fg="white"))
+        btn.bind("<Leave>", lambda e: btn.config(bg=btn.base_bg, fg=self.colors["button_text"]))
         return btn
 
     def show_file_menu(self):
@@ -319,18 +3046,32 @@ class ModernExpenseTracker:
         self.view_menu.post(self.nav_frame.winfo_rootx() + 60,
                            self.nav_frame.winfo_rooty() + self.nav_frame.winfo_height())
 
+    def report_io_error(self, error):
+        self.show_custom_message("ERROR", f"Failed to save data: {str(error)}", "error")
+
+    def on_close(self):
+        if self.import_job is not None:
+            self.finish_import(cancelled=True)
+        self.user_data.close()
+        self.io.stop()
+        if self.watchdog is not None:
+            self.watchdog.stop()
+        self.profiler.disable()
+        self.root.destroy()
+
     def logout(self):
-        self.save_user_data()
+        if self.import_job is not None:
+            self.finish_import(cancelled=True)
+        self.user_data[self.current_user]['store'].close()
+        self.user_data.trim()
         self.current_user = None
-        self.nav_frame.pack_forget()
-        self.main_frame.pack_forget()
-        self.add_expense_frame.pack_forget()
-        self.view_expenses_frame.pack_forget()
-        self.stats_frame.pack_forget()
-        self.settings_frame.pack_forget()
-        self.sip_tracker_frame.pack_forget()
-        self.view_sips_frame.pack_forget()  # Added
-        self.budget_frame.pack_forget()
+        self.nav_frame.destroy()
+        for frame in self.frames.values():
+            frame.destroy()
+        self.frames = {}
+        self.current_screen = None
+        self.refresh.cancel()
+        self.dismiss_budget_notification()
         self.login_frame.pack(fill="both", expand=True)
         self.username_entry.delete(0, tk.END)
         self.password_entry.delete(0, tk.END)
@@ -379,7 +3120,7 @@ class ModernExpenseTracker:
 
         sip_card = tk.Frame(cards_frame, bg=self.colors["card"], padx=15, pady=15)
         sip_card.grid(row=1, column=1, padx=10, pady=10, sticky="nsew")
-        tk.Label(sip_card, text="TOTAL SIP", font=self.fonts["subheader"],
+        tk.Label(sip_card, text="SIP PER MONTH", font=self.fonts["subheader"],
                  bg=self.colors["card"], fg=self.colors["text"]).pack(anchor="w")
         self.sip_total_label = tk.Label(sip_card, text="₹0.00", font=("Segoe UI", 16, "bold"),
                                        bg=self.colors["card"], fg=self.colors["info"])
@@ -403,19 +3144,19 @@ class ModernExpenseTracker:
         buttons_frame.pack(fill="x")
 
         self.create_button(buttons_frame, "+ ADD EXPENSE",
-                          lambda: self.show_frame(self.add_expense_frame),
+                          lambda: self.show_frame("add_expense"),
                           self.colors["accent"]).pack(side="left", padx=5, ipadx=8, ipady=4)
         self.create_button(buttons_frame, "VIEW ALL",
-                          lambda: self.show_frame(self.view_expenses_frame),
+                          lambda: self.show_frame("view_expenses"),
                           self.colors["info"]).pack(side="left", padx=5, ipadx=8, ipady=4)
         self.create_button(buttons_frame, "STATS",
-                          lambda: self.show_frame(self.stats_frame),
+                          lambda: self.show_frame("stats"),
                           self.colors["highlight"]).pack(side="left", padx=5, ipadx=8, ipady=4)
         self.create_button(buttons_frame, "ADD SIP",
-                          lambda: self.show_frame(self.sip_tracker_frame),
+                          lambda: self.show_frame("sip_tracker"),
                           self.colors["success"]).pack(side="left", padx=5, ipadx=8, ipady=4)
         self.create_button(buttons_frame, "BUDGET",
-                          lambda: self.show_frame(self.budget_frame),
+                          lambda: self.show_frame("budget"),
                           self.colors["warning"]).pack(side="left", padx=5, ipadx=8, ipady=4)
 
     def create_add_expense_frame(self):
@@ -458,7 +3199,7 @@ class ModernExpenseTracker:
                           self.colors["success"]).pack(side="left", padx=5, ipadx=8, ipady=4)
         self.create_button(button_frame, "🗑️ CLEAR", self.clear_expense_form,
                           self.colors["warning"]).pack(side="left", padx=5, ipadx=8, ipady=4)
-        self.create_button(button_frame, "🔙 BACK", lambda: self.show_frame(self.main_frame),
+        self.create_button(button_frame, "🔙 BACK", lambda: self.show_frame("main"),
                           self.colors["secondary"]).pack(side="right", padx=5, ipadx=8, ipady=4)
 
     def create_view_expenses_frame(self):
@@ -474,7 +3215,7 @@ class ModernExpenseTracker:
         tk.Label(filter_frame, text="FILTER:", font=self.fonts["subheader"],
                  bg=self.colors["background"], fg=self.colors["text"]).pack(side="left")
         self.month_var = tk.StringVar(value="All")
-        months = ["All"] + [datetime(2000, m, 1).strftime("%B") for m in range(1, 13)]
+        months = ["All"] + self.month_names
         month_dropdown = ttk.Combobox(filter_frame, textvariable=self.month_var,
                                      values=months, font=self.fonts["body"], width=10)
         month_dropdown.pack(side="left", padx=5, ipady=4)
@@ -490,11 +3231,11 @@ class ModernExpenseTracker:
         self.search_var = tk.StringVar()
         search_entry = tk.Entry(filter_frame, textvariable=self.search_var,
                                font=self.fonts["body"], bd=0,
-                               bg="#3a3a4a" if self.current_theme == "dark" else "#e0e0e0",
+                               bg=self.colors["entry"],
                                fg=self.colors["text"], insertbackground=self.colors["text"],
                                relief="flat")
         search_entry.pack(side="left", padx=5, ipady=5, ipadx=50)
-        search_entry.bind("<KeyRelease>", lambda e: self.update_expenses_table())
+        search_entry.bind("<KeyRelease>", self.schedule_search)
 
         self.create_button(filter_frame, "🔍 SEARCH", self.update_expenses_table,
                           self.colors["accent"], small=True).pack(side="left", padx=5, ipadx=8, ipady=4)
@@ -517,21 +3258,35 @@ class ModernExpenseTracker:
         self.tree.column("Amount", width=100, anchor="center")
         self.tree.column("Description", width=200, anchor="w")
 
-        scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
+        scrollbar = ttk.Scrollbar(table_frame, orient="vertical")
         scrollbar.pack(side="right", fill="y")
-        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.expense_table = VirtualTreeview(self.tree, scrollbar, lambda exp: (
+            exp['id'],
+            exp['date'],
+            exp['category'],
+            f"₹{exp['amount']:.2f}",
+            exp['description']
+        ))
+        self.expense_table_filters = None
 
         self.context_menu = tk.Menu(self.tree, tearoff=0, bg=self.colors["card"], fg=self.colors["text"],
                                    activebackground=self.colors["accent"], activeforeground="white",
                                    font=self.fonts["body"])
         self.context_menu.add_command(label="✏️ EDIT", command=self.edit_expense)
+        self.recategorize_menu = tk.Menu(self.context_menu, tearoff=0, bg=self.colors["card"], fg=self.colors["text"],
+                                        activebackground=self.colors["accent"], activeforeground="white",
+                                        font=self.fonts["body"])
+        for category in self.categories:
+            self.recategorize_menu.add_command(label=category,
+                                               command=lambda c=category: self.recategorize_expenses(c))
+        self.context_menu.add_cascade(label="🏷️ RECATEGORIZE", menu=self.recategorize_menu)
         self.context_menu.add_command(label="🗑️ DELETE", command=self.delete_expense)
         self.tree.bind("<Button-3>", self.show_context_menu)
 
         button_frame = tk.Frame(self.view_expenses_frame, bg=self.colors["background"], padx=20, pady=15)
         button_frame.pack(fill="x")
         self.create_button(button_frame, "🔙 BACK",
-                          lambda: self.show_frame(self.main_frame),
+                          lambda: self.show_frame("main"),
                           self.colors["secondary"]).pack(side="right", ipadx=8, ipady=4)
 
     def create_stats_frame(self):
@@ -541,19 +3296,25 @@ class ModernExpenseTracker:
         tk.Label(header, text="📊 STATISTICS", font=self.fonts["title"],
                  bg=self.colors["primary"], fg="white", pady=10).pack()
 
-        chart_frame = tk.Frame(self.stats_frame, bg=self.colors["card"], padx=20, pady=20)
-        chart_frame.pack(padx=30, pady=20, fill="both", expand=True)
-
+        controls = tk.Frame(self.stats_frame, bg=self.colors["background"], padx=30)
+        controls.pack(fill="x", pady=(15, 0))
+        tk.Label(controls, text="VIEW", font=self.fonts["body"],
+                 bg=self.colors["background"], fg=self.colors["text"]).pack(side="left")
+        self.stats_view_var = tk.StringVar(value=next(iter(self.stats_views)))
+        view_dropdown = ttk.Combobox(controls, textvariable=self.stats_view_var, values=list(self.stats_views),
+                                     font=self.fonts["body"], state="readonly")
+        view_dropdown.pack(side="left", padx=10)
+        view_dropdown.bind("<<ComboboxSelected>>", self.change_stats_view)
+
+        self.chart_frame = tk.Frame(self.stats_frame, bg=self.colors["card"], padx=20, pady=20)
+        self.chart_frame.pack(padx=30, pady=(10, 20), fill="both", expand=True)
         self.update_chart_style()
-        self.fig, (self.ax1, self.ax2) = plt.subplots(1, 2, figsize=(8, 4))
-        self.fig.patch.set_facecolor(self.colors["card"])
-        self.canvas = FigureCanvasTkAgg(self.fig, master=chart_frame)
-        self.canvas.get_tk_widget().pack(fill="both", expand=True)
+        self.stats_charts = {}
 
         button_frame = tk.Frame(self.stats_frame, bg=self.colors["background"], padx=20, pady=15)
         button_frame.pack(fill="x")
         self.create_button(button_frame, "🔙 BACK",
-                          lambda: self.show_frame(self.main_frame),
+                          lambda: self.show_frame("main"),
                           self.colors["secondary"]).pack(side="right", ipadx=8, ipady=4)
 
     def create_settings_frame(self):
@@ -564,7 +3325,7 @@ class ModernExpenseTracker:
                  bg=self.colors["primary"], fg="white", pady=10).pack()
 
         settings_container = tk.Frame(self.settings_frame, bg=self.colors["card"], padx=20, pady=20)
-        settings_container.pack(pady=50, padx=30, fill="both")
+        settings_container.pack(pady=20, padx=30, fill="both")
 
         tk.Label(settings_container, text="THEME", font=self.fonts["body"],
                  bg=self.colors["card"], fg=self.colors["text"]).pack(anchor="w", pady=10)
@@ -583,10 +3344,35 @@ class ModernExpenseTracker:
         self.create_button(account_frame, "🔄 Switch", self.switch_account,
                           self.colors["accent"], small=True).pack(side="left", padx=10, ipadx=8, ipady=4)
 
+        tk.Label(settings_container, text="PERFORMANCE", font=self.fonts["body"],
+                 bg=self.colors["card"], fg=self.colors["text"]).pack(anchor="w", pady=10)
+        perf_controls = tk.Frame(settings_container, bg=self.colors["card"])
+        perf_controls.pack(fill="x")
+        self.profile_var = tk.BooleanVar(value=self.profiler.enabled)
+        tk.Checkbutton(perf_controls, text="Record timings", variable=self.profile_var,
+                       command=self.toggle_profiling, font=self.fonts["body"],
+                       bg=self.colors["card"], fg=self.colors["text"], selectcolor=self.colors["card"],
+                       activebackground=self.colors["card"], activeforeground=self.colors["text"]).pack(side="left")
+        self.create_button(perf_controls, "🔄 Refresh", self.update_perf_panel,
+                          self.colors["secondary"], small=True).pack(side="left", padx=10, ipadx=8, ipady=4)
+        self.create_button(perf_controls, "🧹 Reset", self.reset_profiling,
+                          self.colors["secondary"], small=True).pack(side="left", ipadx=8, ipady=4)
+        self.update_treeview_style()
+        self.perf_tree = ttk.Treeview(settings_container, columns=("Operation", "Calls", "Rows", "p50", "p95"),
+                                     show="headings", height=6, style="Treeview")
+        self.perf_tree.pack(fill="x", pady=(10, 0))
+        for column, width in (("Operation", 200), ("Calls", 70), ("Rows", 90), ("p50", 90), ("p95", 90)):
+            self.perf_tree.heading(column, text=column.upper())
+            self.perf_tree.column(column, width=width, anchor="w" if column == "Operation" else "e")
+        self.perf_counters_label = tk.Label(settings_container, font=self.fonts["small"],
+                                            bg=self.colors["card"], fg=self.colors["text"], anchor="w")
+        self.perf_counters_label.pack(fill="x", pady=(5, 0))
+        self.update_perf_panel()
+
         button_frame = tk.Frame(settings_container, bg=self.colors["card"])
         button_frame.pack(pady=20)
         self.create_button(button_frame, "🔙 BACK",
-                          lambda: self.show_frame(self.main_frame),
+                          lambda: self.show_frame("main"),
                           self.colors["secondary"]).pack(ipadx=8, ipady=4)
 
     def create_sip_tracker_frame(self):
@@ -638,7 +3424,7 @@ class ModernExpenseTracker:
         self.create_button(button_frame, "🗑️ CLEAR", self.clear_sip_form,
                           self.colors["warning"]).pack(side="left", padx=5, ipadx=8, ipady=4)
         self.create_button(button_frame, "🔙 BACK",
-                          lambda: self.show_frame(self.main_frame),
+                          lambda: self.show_frame("main"),
                           self.colors["secondary"]).pack(side="right", padx=5, ipadx=8, ipady=4)
 
     def create_view_sips_frame(self):
@@ -668,9 +3454,16 @@ class ModernExpenseTracker:
         self.sip_tree.column("Frequency", width=100, anchor="center")
         self.sip_tree.column("Start Date", width=100, anchor="center")
 
-        scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.sip_tree.yview)
+        scrollbar = ttk.Scrollbar(table_frame, orient="vertical")
         scrollbar.pack(side="right", fill="y")
-        self.sip_tree.configure(yscrollcommand=scrollbar.set)
+        self.sip_table = VirtualTreeview(self.sip_tree, scrollbar, lambda sip: (
+            sip['id'],
+            sip['name'],
+            f"₹{sip['amount']:,.2f}",
+            sip['category'],
+            sip['frequency'],
+            sip['start_date']
+        ))
 
         self.sip_context_menu = tk.Menu(self.sip_tree, tearoff=0, bg=self.colors["card"], fg=self.colors["text"],
                                        activebackground=self.colors["accent"], activeforeground="white",
@@ -681,7 +3474,7 @@ class ModernExpenseTracker:
         button_frame = tk.Frame(self.view_sips_frame, bg=self.colors["background"], padx=20, pady=15)
         button_frame.pack(fill="x")
         self.create_button(button_frame, "🔙 BACK",
-                          lambda: self.show_frame(self.main_frame),
+                          lambda: self.show_frame("main"),
                           self.colors["secondary"]).pack(side="right", ipadx=8, ipady=4)
 
     def create_budget_frame(self):
@@ -731,11 +3524,11 @@ class ModernExpenseTracker:
             tk.Label(goal_frame, text=f"{category}:", font=self.fonts["body"],
                      bg=self.colors["card"], fg=self.colors["text"]).pack(side="left", padx=5)
             entry = tk.Entry(goal_frame, font=self.fonts["body"], bd=0,
-                            bg="#3a3a4a" if self.current_theme == "dark" else "#e0e0e0",
+                            bg=self.colors["entry"],
                             fg=self.colors["text"], insertbackground=self.colors["text"],
                             relief="flat", width=20)
             entry.pack(side="left", fill="x", expand=True, padx=5, ipady=6)
-            entry.insert(0, str(self.user_data[self.current_user]['monthly_goals'].get(category, 0.0)))
+            entry.insert(0, str(self.user_data[self.current_user]['store'].goals.get(category, 0.0)))
             self.goal_entries[category] = entry
 
         canvas.pack(side="left", fill="both", expand=True, padx=20, pady=20)
@@ -747,7 +3540,7 @@ class ModernExpenseTracker:
                           self.colors["success"]).pack(side="left", padx=5, ipadx=15, ipady=6)
         self.create_button(button_frame, "🗑️ CLEAR", self.clear_budget_form,
                           self.colors["warning"]).pack(side="left", padx=5, ipadx=15, ipady=6)
-        self.create_button(button_frame, "🔙 BACK", lambda: self.show_frame(self.main_frame),
+        self.create_button(button_frame, "🔙 BACK", lambda: self.show_frame("main"),
                           self.colors["secondary"]).pack(side="right", padx=5, ipadx=15, ipady=6)
 
     def save_budget(self):
@@ -761,20 +3554,21 @@ class ModernExpenseTracker:
             user['monthly_budget'] = monthly_budget
             user['daily_budget'] = daily_budget
 
+            goals = dict(user['store'].goals)
             for category, entry in self.goal_entries.items():
                 value = entry.get().strip()
                 if value:
                     amount = float(value)
                     if amount < 0:
                         raise ValueError(f"Goal for {category} cannot be negative")
-                    user['monthly_goals'][category] = amount
+                    goals[category] = amount
                 else:
-                    user['monthly_goals'].pop(category, None)
+                    goals.pop(category, None)
 
-            self.save_user_data()
+            user['store'].set_goals(goals)
+            user['alerts'].touch_all()
             self.show_custom_message("SUCCESS", "Budget settings updated successfully! 🎉", "success")
-            self.update_dashboard()
-            self.check_budget_alerts()
+            self.refresh.mark("dashboard", "alerts")
         except ValueError as e:
             self.show_custom_message("ERROR", f"🚫 Invalid input: {str(e)}", "error")
 
@@ -785,62 +3579,54 @@ class ModernExpenseTracker:
         self.daily_budget_entry.insert(0, str(self.user_data[self.current_user]['daily_budget']))
         for category, entry in self.goal_entries.items():
             entry.delete(0, tk.END)
-            entry.insert(0, str(self.user_data[self.current_user]['monthly_goals'].get(category, 0.0)))
+            entry.insert(0, str(self.user_data[self.current_user]['store'].goals.get(category, 0.0)))
 
     def check_budget_alerts(self):
         user = self.user_data[self.current_user]
-        current_month = datetime.now().strftime("%Y-%m")
-        current_day = datetime.now().strftime("%Y-%m-%d")
-        
-        monthly_total = sum(exp['amount'] for exp in user['expenses'] if exp['date'].startswith(current_month))
-        if user['monthly_budget'] > 0:
-            percentage = (monthly_total / user['monthly_budget']) * 100
-            if percentage >= 90 and percentage < 100:
-                self.show_budget_alert("Monthly Budget Warning",
-                                      f"🚨 You've spent {percentage:.1f}% of your monthly budget!\n"
-                                      f"Spent: ₹{monthly_total:,.2f}\nBudget: ₹{user['monthly_budget']:,.2f}",
-                                      self.colors["warning"])
-            elif percentage >= 100:
-                self.show_budget_alert("Monthly Budget Exceeded",
-                                      f"❌ You've exceeded your monthly budget!\n"
-                                      f"Spent: ₹{monthly_total:,.2f}\nBudget: ₹{user['monthly_budget']:,.2f}",
-                                      self.colors["danger"])
-
-        daily_total = sum(exp['amount'] for exp in user['expenses'] if exp['date'] == current_day)
-        if user['daily_budget'] > 0 and daily_total > user['daily_budget']:
-            self.show_budget_alert("Daily Budget Exceeded",
-                                  f"⚠️ Today's spending exceeds your daily budget!\n"
-                                  f"Spent: ₹{daily_total:,.2f}\nBudget: ₹{user['daily_budget']:,.2f}",
-                                  self.colors["warning"])
-
-        monthly_totals = {}
-        for exp in user['expenses']:
-            if exp['date'].startswith(current_month):
-                monthly_totals[exp['category']] = monthly_totals.get(exp['category'], 0) + exp['amount']
-        for category, goal in user['monthly_goals'].items():
-            spent = monthly_totals.get(category, 0)
-            if spent > goal and goal > 0:
-                self.show_budget_alert("Category Budget Alert",
-                                      f"🚨 {category} spending exceeded!\n"
-                                      f"Spent: ₹{spent:,.2f}\nGoal: ₹{goal:,.2f}",
-                                      self.colors["warning"])
-
-    def show_budget_alert(self, title, message, color):
-        alert = tk.Toplevel(self.root)
-        alert.title(title)
-        alert.geometry("400x200")
-        alert.resizable(False, False)
-        alert.configure(bg=self.colors["background"])
-        alert.grab_set()
-        x = (self.root.winfo_screenwidth() // 2) - 200
-        y = (self.root.winfo_screenheight() // 2) - 100
-        alert.geometry(f"400x200+{x}+{y}")
-
-        tk.Label(alert, text="💰 BUDGET ALERT", font=self.fonts["header"],
-                 bg=self.colors["background"], fg=color).pack(pady=(15, 10))
-        tk.Label(alert, text=message, font=self.fonts["body"],
-                 bg=self.colors["background"], fg=self.colors["text"], wraplength=350).pack(pady=10)
-        self.create_button(alert, "OK", alert.destroy, color).pack(pady=10, ipadx=8, ipady=4)
+        alerts = user['alerts'].evaluate(user['store'], user['monthly_budget'], user['daily_budget'])
+        if alerts:
+            self.show_budget_notification(alerts)
+
+    def touch_alerts(self, *expenses):
+        alerts = self.user_data[self.current_user]['alerts']
+        for exp in expenses:
+            alerts.touch(exp['date'], exp['category'])
+
+    def show_budget_notification(self, alerts):
+        # Everything one pass found goes into a single non-modal notice in the corner of the
+        # window, merged with any notice still showing, which then closes itself.
+        if self.alert_window is not None:
+            alerts = self.alert_window.alerts + alerts
+            self.dismiss_budget_notification()
+        color = self.colors["danger" if any(level == "danger" for _, _, level in alerts) else "warning"]
+        window = tk.Toplevel(self.root)
+        window.title("Budget Alert")
+        window.transient(self.root)
+        window.resizable(False, False)
+        window.configure(bg=self.colors["background"], highlightthickness=2, highlightbackground=color)
+        window.alerts = alerts
+        tk.Label(window, text="💰 BUDGET ALERT" if len(alerts) == 1 else f"💰 {len(alerts)} BUDGET ALERTS",
+                 font=self.fonts["header"], bg=self.colors["background"], fg=color).pack(padx=15, pady=(10, 5))
+        for title, message, level in alerts:
+            tk.Label(window, text=title, font=self.fonts["button"], bg=self.colors["background"],
+                     fg=self.colors[level]).pack(anchor="w", padx=15)
+            tk.Label(window, text=message, font=self.fonts["small"], justify="left", bg=self.colors["background"],
+                     fg=self.colors["text"], wraplength=320).pack(anchor="w", padx=15, pady=(0, 5))
+        self.create_button(window, "OK", self.dismiss_budget_notification, color,
+                           small=True).pack(pady=(5, 10), ipadx=8, ipady=2)
+        window.update_idletasks()
+        x = self.root.winfo_rootx() + self.root.winfo_width() - window.winfo_reqwidth() - 20
+        y = self.root.winfo_rooty() + self.root.winfo_height() - window.winfo_reqheight() - 20
+        window.geometry(f"+{max(0, x)}+{max(0, y)}")
+        window.protocol("WM_DELETE_WINDOW", self.dismiss_budget_notification)
+        window.after_id = self.root.after(ALERT_DISMISS_MS, self.dismiss_budget_notification)
+        self.alert_window = window
+
+    def dismiss_budget_notification(self):
+        window, self.alert_window = self.alert_window, None
+        if window is not None:
+            self.root.after_cancel(window.after_id)
+            window.destroy()
 
     def darken_color(self, color, percent):
         color = color.lstrip('#')
@@ -859,24 +3645,18 @@ class ModernExpenseTracker:
             amount = float(self.amount_entry.get().strip())
             if amount <= 0:
                 raise ValueError("Amount must be positive")
-            date = self.date_entry.get().strip()
-            datetime.strptime(date, "%Y-%m-%d")
+            date = datetime.strptime(self.date_entry.get().strip(), "%Y-%m-%d").strftime("%Y-%m-%d")
             expense = {
-                'id': self.next_expense_id,
                 'date': date,
                 'category': self.category_var.get(),
                 'amount': amount,
                 'description': self.desc_entry.get()
             }
-            self.next_expense_id += 1
-            self.user_data[self.current_user]['expenses'].append(expense)
-            self.save_user_data()
+            self.user_data[self.current_user]['store'].add_expense(expense)
+            self.touch_alerts(expense)
             self.clear_expense_form()
             self.show_custom_message("SUCCESS", "Expense created successfully! 💾", "success")
-            self.update_dashboard()
-            self.update_expenses_table()
-            self.update_charts()
-            self.check_budget_alerts()
+            self.refresh.mark("dashboard", "expenses", "charts", "alerts")
         except ValueError as e:
             self.show_custom_message("ERROR", f"🚫 {str(e)}", "error")
 
@@ -891,19 +3671,14 @@ class ModernExpenseTracker:
             if not name:
                 raise ValueError("Name is required")
             sip = {
-                'id': self.next_sip_id,
                 'name': name,
                 'amount': amount,
                 'category': self.sip_category_var.get(),
                 'frequency': self.sip_freq_var.get(),
                 'start_date': date
             }
-            self.next_sip_id += 1
-            self.user_data[self.current_user]['sips'].append(sip)
-            self.save_user_data()
-            self.update_sip_table()
-            self.update_dashboard()
-            self.update_charts()
+            self.user_data[self.current_user]['store'].add_sip(sip)
+            self.refresh.mark("sips", "dashboard", "charts")
             self.clear_sip_form()
             self.show_custom_message("SUCCESS", "SIP created successfully! 💹", "success")
         except ValueError as e:
@@ -948,134 +3723,137 @@ class ModernExpenseTracker:
         self.sip_name_entry.delete(0, tk.END)
 
     def update_dashboard(self):
+        if "main" not in self.frames:
+            return
         user = self.user_data[self.current_user]
-        expenses = user['expenses']
-        sips = user['sips']
-        
-        total = sum(exp['amount'] for exp in expenses)
-        self.total_label.config(text=f"₹{total:,.2f}")
+        store = user['store']
+
+        self.total_label.config(text=f"₹{store.expense_total():,.2f}")
 
-        if expenses:
-            recent_exp = max(expenses, key=lambda x: datetime.strptime(x['date'], "%Y-%m-%d"))
+        recent_exp = store.latest_expense()
+        if recent_exp:
             self.recent_label.config(text=f"{recent_exp['category']}: ₹{recent_exp['amount']:.2f}\n{recent_exp['date']}")
         else:
             self.recent_label.config(text="No recent expenses", fg=self.colors["accent"])
 
-        if expenses:
-            cat_counts = {}
-            for exp in expenses:
-                cat_counts[exp['category']] = cat_counts.get(exp['category'], 0) + exp['amount']
-            if cat_counts:
-                top_cat = max(cat_counts.items(), key=lambda x: x[1])[0]
-                self.cat_label.config(text=top_cat, fg=self.colors["highlight"])
+        cat_counts = store.category_totals()
+        if cat_counts:
+            top_cat = max(cat_counts.items(), key=lambda x: x[1])[0]
+            self.cat_label.config(text=top_cat, fg=self.colors["highlight"])
         else:
             self.cat_label.config(text="No data", fg=self.colors["highlight"])
 
-        sip_total = sum(sip['amount'] for sip in sips)
-        self.sip_total_label.config(text=f"₹{sip_total:,.2f}", fg=self.colors["info"])
+        # Quarterly and yearly installments are spread over their months so mixed frequencies add up.
+        self.sip_total_label.config(text=f"₹{sip_monthly_outflow(store.sips):,.2f}", fg=self.colors["info"])
 
         current_month = datetime.now().strftime("%Y-%m")
         current_day = datetime.now().strftime("%Y-%m-%d")
-        monthly_spent = sum(exp['amount'] for exp in expenses if exp['date'].startswith(current_month))
-        daily_spent = sum(exp['amount'] for exp in expenses if exp['date'] == current_day)
+        monthly_spent = store.month_total(current_month)
+        daily_spent = store.day_total(current_day)
         self.budget_label.config(text=f"₹{monthly_spent:,.2f} / ₹{user['monthly_budget']:,.2f}", fg=self.colors["info"])
         self.daily_label.config(text=f"₹{daily_spent:,.2f} / ₹{user['daily_budget']:,.2f}", fg=self.colors["warning"])
 
     def update_expenses_table(self):
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        if "view_expenses" not in self.frames:
+            return
         user = self.user_data[self.current_user]
         month = self.month_var.get()
         year = self.year_var.get()
         search_term = self.search_var.get().lower()
-        filtered = user['expenses'][:]
-        if month != "All":
-            filtered = [exp for exp in filtered if datetime.strptime(exp['date'], "%Y-%m-%d").strftime("%B") == month]
-        if year != "All":
-            filtered = [exp for exp in filtered if str(datetime.strptime(exp['date'], "%Y-%m-%d").year) == year]
-        if search_term:
-            filtered = [exp for exp in filtered if (search_term in exp['description'].lower() or search_term in exp['category'].lower())]
-        filtered.sort(key=lambda x: datetime.strptime(x['date'], "%Y-%m-%d"), reverse=True)
-        for exp in filtered:
-            self.tree.insert("", "end", values=(
-                exp['id'],
-                exp['date'],
-                exp['category'],
-                f"₹{exp['amount']:.2f}",
-                exp['description']
-            ))
+        year = None if year == "All" else int(year)
+        month = None if month == "All" else self.month_names.index(month) + 1
+        filtered, total = user['store'].query_expenses(year=year, month=month, search=search_term)
+        if total is not None:
+            self.profiler.count_rows(total)
+        # Refreshes after an edit or delete keep the scroll position; new filters start at the top.
+        filters = (year, month, search_term)
+        self.expense_table.set_source(filtered, total, reset=filters != self.expense_table_filters)
+        self.expense_table_filters = filters
+
+    def schedule_search(self, event=None):
+        if self.search_after_id is not None:
+            self.root.after_cancel(self.search_after_id)
+        self.search_after_id = self.root.after(SEARCH_DEBOUNCE_MS, self.run_search)
+
+    def run_search(self):
+        self.search_after_id = None
+        self.update_expenses_table()
 
     def update_sip_table(self):
-        for item in self.sip_tree.get_children():
-            self.sip_tree.delete(item)
-        user = self.user_data[self.current_user]
-        for sip in sorted(user['sips'], key=lambda x: x['id'], reverse=True):
-            self.sip_tree.insert("", "end", values=(
-                sip['id'],
-                sip['name'],
-                f"₹{sip['amount']:,.2f}",
-                sip['category'],
-                sip['frequency'],
-                sip['start_date']
-            ))
-
-    def update_charts(self):
-        self.ax1.clear()
-        self.ax2.clear()
+        if "view_sips" not in self.frames:
+            return
         user = self.user_data[self.current_user]
-        if not user['expenses'] and not user['sips']:
-            self.ax1.text(0.5, 0.5, "No data", ha="center", va="center",
-                         fontsize=10, color=self.colors["text"])
-            self.ax2.text(0.5, 0.5, "No data", ha="center", va="center",
-                         fontsize=10, color=self.colors["text"])
-        else:
-            if user['expenses']:
-                cat_totals = {}
-                for exp in user['expenses']:
-                    cat = exp['category']
-                    cat_totals[cat] = cat_totals.get(cat, 0) + exp['amount']
-                categories = list(cat_totals.keys())
-                amounts = list(cat_totals.values())
-                colors = plt.cm.viridis([i/float(len(categories)) for i in range(len(categories))])
-                self.ax1.pie(amounts, labels=categories, autopct="%1.1f%%", startangle=90,
-                            colors=colors, textprops={'color': self.colors["text"], 'fontsize': 8})
-                self.ax1.set_title("Expenses by Category", color=self.colors["text"], fontsize=10)
-
-            if user['sips']:
-                sip_totals = {}
-                for sip in user['sips']:
-                    cat = sip['category']
-                    sip_totals[cat] = sip_totals.get(cat, 0) + sip['amount']
-                categories = list(sip_totals.keys())
-                amounts = list(sip_totals.values())
-                self.ax2.bar(categories, amounts, color=self.colors["accent"])
-                self.ax2.set_title("SIP by Category", color=self.colors["text"], fontsize=10)
-                self.ax2.tick_params(axis="x", rotation=45, colors=self.colors["text"])
-                self.ax2.tick_params(axis="y", colors=self.colors["text"])
-
-        self.fig.tight_layout()
-        self.canvas.draw()
+        sips = sorted(user['store'].sips, key=lambda x: x['id'], reverse=True)
+        self.profiler.count_rows(len(sips))
+        self.sip_table.set_source(sips, len(sips), reset=False)
+
+    def stats_chart(self, view):
+        chart = self.stats_charts.get(view)
+        if chart is None:
+            mpl = load_matplotlib()
+            fig = mpl.Figure(figsize=(8, 4))
+            fig.patch.set_facecolor(self.colors["card"])
+            canvas = mpl.FigureCanvasTkAgg(fig, master=self.chart_frame)
+            chart = self.stats_charts[view] = self.stats_views[view](fig, canvas)
+        return chart
+
+    def change_stats_view(self, event=None):
+        self.refresh.refresh("charts", force=True)
+
+    def render_charts(self):
+        view = self.stats_view_var.get()
+        chart = self.stats_chart(view)
+        for other in self.stats_charts.values():
+            if other is not chart:
+                other.canvas.get_tk_widget().pack_forget()
+        chart.canvas.get_tk_widget().pack(fill="both", expand=True)
+        rebuild = view in self.charts_restyle
+        self.charts_restyle.discard(view)
+        store = self.user_data[self.current_user]['store']
+        cmap = load_matplotlib().colormaps["viridis"]
+        if view == "SIP Projection":
+            chart.render(project_sips(store.sips), self.colors["text"], self.colors["accent"], cmap, rebuild=rebuild)
+            return
+        if view == "Monthly Trend":
+            months, columns = store.month_category_matrix().window(TREND_MONTHS)
+            chart.render(months, columns, self.colors["text"], self.colors["danger"], self.colors["success"],
+                         cmap, rebuild=rebuild)
+            return
+        if view == "Category Share":
+            months, columns = store.month_category_matrix().window(TREND_MONTHS)
+            chart.render(months, columns, self.colors["text"], cmap, rebuild=rebuild)
+            return
+        sip_totals = {}
+        for sip in store.sips:
+            sip_totals[sip['category']] = sip_totals.get(sip['category'], 0) + sip['amount']
+        chart.render(store.category_totals(), sip_totals, self.colors["text"],
+                     self.colors["accent"], cmap, rebuild=rebuild)
 
     def show_context_menu(self, event):
         item = self.tree.identify_row(event.y)
         if item:
-            self.tree.selection_set(item)
+            # Right-clicking inside a multi-row selection keeps it for the bulk actions.
+            if item not in self.tree.selection():
+                self.expense_table.clear_selection()
+                self.tree.selection_set(item)
+            self.tree.focus(item)
             self.context_menu.post(event.x_root, event.y_root)
 
     def show_sip_context_menu(self, event):
         item = self.sip_tree.identify_row(event.y)
         if item:
-            self.sip_tree.selection_set(item)
+            if item not in self.sip_tree.selection():
+                self.sip_table.clear_selection()
+                self.sip_tree.selection_set(item)
+            self.sip_tree.focus(item)
             self.sip_context_menu.post(event.x_root, event.y_root)
 
     def edit_expense(self):
-        selected_item = self.tree.selection()
-        if not selected_item:
+        expense_id = self.expense_table.key_at(self.tree.focus())
+        if expense_id is None:
             return
-        item = self.tree.item(selected_item)
-        expense_id = item['values'][0]
-        user = self.user_data[self.current_user]
-        expense = next((exp for exp in user['expenses'] if exp['id'] == expense_id), None)
+        store = self.user_data[self.current_user]['store']
+        expense = store.get_expense(expense_id)
         if not expense:
             return
 
@@ -1124,55 +3902,71 @@ class ModernExpenseTracker:
                 amount = float(amount_entry.get().strip())
                 if amount <= 0:
                     raise ValueError("Amount must be positive")
-                new_date = date_entry.get().strip()
-                datetime.strptime(new_date, "%Y-%m-%d")
+                new_date = datetime.strptime(date_entry.get().strip(), "%Y-%m-%d").strftime("%Y-%m-%d")
+                # The old date and category's thresholds are affected as well as the new ones.
+                self.touch_alerts(expense)
                 expense['amount'] = amount
                 expense['category'] = category_var.get()
                 expense['date'] = new_date
                 expense['description'] = desc_entry.get()
-                self.save_user_data()
-                self.update_expenses_table()
-                self.update_dashboard()
-                self.update_charts()
+                store.update_expenses([expense])
+                self.touch_alerts(expense)
+                self.refresh.mark("expenses", "dashboard", "charts", "alerts")
                 edit_window.destroy()
                 self.show_custom_message("SUCCESS", "Expense updated successfully! ✏️", "success")
-                self.check_budget_alerts()
             except ValueError as e:
                 self.show_custom_message("ERROR", f"🚫 Invalid input: {e}", "error")
 
-        self.create_button(button_frame, "💾 SAVE", save_changes,
+        self.create_button(button_frame, "💾 SAVE", self.profiler.wrap("edit_expense.save", save_changes),
                           self.colors["success"]).pack(side="left", padx=5, ipadx=8, ipady=4)
         self.create_button(button_frame, "❌ CANCEL", edit_window.destroy,
                           self.colors["danger"]).pack(side="right", padx=5, ipadx=8, ipady=4)
 
     def delete_expense(self):
-        selected_item = self.tree.selection()
-        if not selected_item:
+        expense_ids = self.expense_table.selection()
+        if not expense_ids:
             return
-        item = self.tree.item(selected_item)
-        expense_id = item['values'][0]
-        user = self.user_data[self.current_user]
-        user['expenses'] = [exp for exp in user['expenses'] if exp['id'] != expense_id]
-        self.save_user_data()
-        self.update_expenses_table()
-        self.update_dashboard()
-        self.update_charts()
-        self.show_custom_message("SUCCESS", "Expense deleted successfully! 🗑️", "success")
-        self.check_budget_alerts()
+        if len(expense_ids) > 1 and not messagebox.askyesno(
+                "Delete Expenses", f"Delete {len(expense_ids):,} selected expenses?", parent=self.root):
+            return
+        removed = self.user_data[self.current_user]['store'].remove_expenses(expense_ids)
+        self.touch_alerts(*removed)
+        self.expense_table.clear_selection()
+        self.refresh.mark("expenses", "dashboard", "charts", "alerts")
+        if len(removed) == 1:
+            self.show_custom_message("SUCCESS", "Expense deleted successfully! 🗑️", "success")
+        else:
+            self.show_custom_message("SUCCESS", f"{len(removed):,} expenses deleted successfully! 🗑️", "success")
+
+    def recategorize_expenses(self, category):
+        expense_ids = self.expense_table.selection()
+        if not expense_ids:
+            return
+        store = self.user_data[self.current_user]['store']
+        changed = []
+        for expense_id in expense_ids:
+            exp = store.get_expense(expense_id)
+            if exp is None or exp['category'] == category:
+                continue
+            self.touch_alerts(exp)
+            exp['category'] = category
+            changed.append(exp)
+        store.update_expenses(changed)
+        self.touch_alerts(*changed)
+        self.refresh.mark("expenses", "dashboard", "charts", "alerts")
+        self.show_custom_message("SUCCESS", f"{len(changed):,} expenses moved to {category}! 🏷️", "success")
 
     def delete_sip(self):
-        selected_item = self.sip_tree.selection()
-        if not selected_item:
+        sip_ids = self.sip_table.selection()
+        if not sip_ids:
             return
-        item = self.sip_tree.item(selected_item)
-        sip_id = item['values'][0]
-        user = self.user_data[self.current_user]
-        user['sips'] = [sip for sip in user['sips'] if sip['id'] != sip_id]
-        self.save_user_data()
-        self.update_sip_table()
-        self.update_dashboard()
-        self.update_charts()
-        self.show_custom_message("SUCCESS", "SIP deleted successfully! 🗑️", "success")
+        removed = self.user_data[self.current_user]['store'].remove_sips(sip_ids)
+        self.sip_table.clear_selection()
+        self.refresh.mark("sips", "dashboard", "charts")
+        if len(removed) == 1:
+            self.show_custom_message("SUCCESS", "SIP deleted successfully! 🗑️", "success")
+        else:
+            self.show_custom_message("SUCCESS", f"{len(removed):,} SIPs deleted successfully! 🗑️", "success")
 
     def export_data(self):
         file_path = filedialog.asksaveasfilename(
@@ -1182,116 +3976,233 @@ class ModernExpenseTracker:
             initialfile=f"trackwise_export_{self.current_user}.csv"
         )
         if file_path:
-            try:
-                user = self.user_data[self.current_user]
+            expenses, sips = self.user_data[self.current_user]['store'].export_rows()
+
+            def write():
                 with open(file_path, mode='w', newline='') as file:
                     writer = csv.writer(file)
                     writer.writerow(["Type", "ID", "Date", "Category", "Amount", "Description", "Frequency"])
-                    for exp in user['expenses']:
+                    rows = 0
+                    for exp in expenses:
                         writer.writerow(["Expense", exp['id'], exp['date'], exp['category'],
                                         exp['amount'], exp['description'], ""])
-                    for sip in user['sips']:
+                        rows += 1
+                    for sip in sips:
                         writer.writerow(["SIP", sip['id'], sip['start_date'], sip['category'],
                                         sip['amount'], sip['name'], sip['frequency']])
-                self.show_custom_message("SUCCESS", "Data exported successfully! 📤", "success")
-            except Exception as e:
-                self.show_custom_message("ERROR", f"Failed to export: {str(e)}", "error")
+                    self.profiler.count_rows(rows + len(sips))
+
+            self.io.submit(
+                write,
+                on_done=lambda result: self.show_custom_message("SUCCESS", "Data exported successfully! 📤", "success"),
+                on_error=lambda e: self.show_custom_message("ERROR", f"Failed to export: {str(e)}", "error"))
 
     def import_data(self):
+        if self.import_job is not None:
+            self.show_custom_message("INFO", "An import is already running.", "info")
+            return
         file_path = filedialog.askopenfilename(
             filetypes=[("CSV Files", "*.csv"), ("All Files", "*.*")],
             title="Select Data File"
         )
-        if file_path:
-            try:
-                with open(file_path, mode='r', newline='') as file:
-                    reader = csv.DictReader(file)
-                    new_expenses = []
-                    new_sips = []
-                    for row in reader:
-                        if row['Type'] == "Expense":
-                            new_exp = {
-                                'id': int(row['ID']),
-                                'date': row['Date'],
-                                'category': row['Category'],
-                                'amount': float(row['Amount']),
-                                'description': row['Description']
-                            }
-                            new_expenses.append(new_exp)
-                        elif row['Type'] == "SIP":
-                            new_sip = {
-                                'id': int(row['ID']),
-                                'name': row['Description'],
-                                'amount': float(row['Amount']),
-                                'category': row['Category'],
-                                'frequency': row['Frequency'],
-                                'start_date': row['Date']
-                            }
-                            new_sips.append(new_sip)
-
-                user = self.user_data[self.current_user]
-                user['expenses'] = new_expenses
-                user['sips'] = new_sips
-                self.next_expense_id = max([exp['id'] for exp in user['expenses']] + [0]) + 1
-                self.next_sip_id = max([sip['id'] for sip in user['sips']] + [0]) + 1
-                self.save_user_data()
-                self.update_expenses_table()
-                self.update_sip_table()
-                self.update_dashboard()
-                self.update_charts()
-                self.show_custom_message("SUCCESS", "Data imported successfully! 📥", "success")
-                self.check_budget_alerts()
-            except Exception as e:
-                self.show_custom_message("ERROR", f"Failed to import: {str(e)}", "error")
+        if not file_path:
+            return
+        merge = messagebox.askyesnocancel(
+            "Import Data", "Merge the file into your existing data?\n\n"
+            "Yes: append, giving imported rows new IDs\nNo: replace all existing data", parent=self.root)
+        if merge is None:
+            return
+
+        store = self.user_data[self.current_user]['store']
+        store.begin_import(merge)
+        batches = queue.Queue(maxsize=IMPORT_QUEUE_BATCHES)
+        cancel = threading.Event()
+        self.import_job = {'store': store, 'merge': merge, 'batches': batches, 'cancel': cancel,
+                           'imported': 0, 'bad': 0, 'bad_rows': [], 'after_id': None}
+        self.create_import_window()
+        threading.Thread(target=self.read_import_file, args=(file_path, batches, cancel), daemon=True).start()
+        self.import_job['after_id'] = self.root.after(IMPORT_POLL_MS, self.apply_import_batches)
+
+    def read_import_file(self, file_path, batches, cancel):
+        # Runs on the reader thread: parsing and validation happen here, while the store is
+        # only touched from the Tk thread in apply_import_batches.
+        def put(item):
+            while not cancel.is_set():
+                try:
+                    batches.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        try:
+            for batch in read_import_batches(file_path):
+                if not put(('batch', batch)):
+                    return
+            put(('done', None))
+        except Exception as e:
+            put(('error', e))
+
+    def create_import_window(self):
+        window = tk.Toplevel(self.root)
+        window.title("📥 IMPORTING")
+        window.geometry("400x180")
+        window.resizable(False, False)
+        window.configure(bg=self.colors["background"])
+        x = (self.root.winfo_screenwidth() // 2) - 200
+        y = (self.root.winfo_screenheight() // 2) - 90
+        window.geometry(f"400x180+{x}+{y}")
+        window.protocol("WM_DELETE_WINDOW", lambda: self.finish_import(cancelled=True))
+        # Modal: the ledger is mid-import, so no edits may land until it finishes or is cancelled.
+        window.transient(self.root)
+        window.grab_set()
+
+        tk.Label(window, text="IMPORTING DATA", font=self.fonts["header"],
+                 bg=self.colors["background"], fg=self.colors["info"]).pack(pady=(15, 5))
+        progress = ttk.Progressbar(window, maximum=1.0, length=340)
+        progress.pack(pady=5)
+        status = tk.Label(window, text="Reading file...", font=self.fonts["body"],
+                          bg=self.colors["background"], fg=self.colors["text"])
+        status.pack(pady=5)
+        self.create_button(window, "❌ CANCEL", lambda: self.finish_import(cancelled=True),
+                          self.colors["danger"]).pack(pady=5, ipadx=8, ipady=4)
+        self.import_job.update(window=window, progress=progress, status=status)
+
+    def apply_import_batches(self):
+        job = self.import_job
+        try:
+            kind, payload = job['batches'].get_nowait()
+        except queue.Empty:
+            job['after_id'] = self.root.after(IMPORT_POLL_MS, self.apply_import_batches)
+            return
+        if kind == 'error':
+            self.finish_import(error=payload)
+            return
+        if kind == 'done':
+            self.finish_import()
+            return
+        # One batch per tick keeps the window responsive between batches.
+        expenses, sips, bad_rows, fraction = payload
+        try:
+            job['store'].import_rows(expenses, sips, remap=job['merge'])
+        except Exception as e:
+            self.finish_import(error=e)
+            return
+        self.refresh.mark("expenses", "sips", "dashboard", "charts")
+        self.profiler.count_rows(len(expenses) + len(sips))
+        job['imported'] += len(expenses) + len(sips)
+        job['bad'] += len(bad_rows)
+        job['bad_rows'].extend(bad_rows[:IMPORT_BAD_ROWS_SHOWN - len(job['bad_rows'])])
+        job['progress']['value'] = fraction
+        job['status'].config(text=f"{job['imported']:,} rows imported, {job['bad']:,} skipped")
+        job['after_id'] = self.root.after(1, self.apply_import_batches)
+
+    def finish_import(self, cancelled=False, error=None):
+        job, self.import_job = self.import_job, None
+        job['cancel'].set()
+        if job['after_id'] is not None:
+            self.root.after_cancel(job['after_id'])
+        job['window'].destroy()
+        if cancelled or error is not None:
+            job['store'].abort_import()
+        else:
+            job['store'].finish_import()
+        if self.current_user is not None:
+            self.user_data[self.current_user]['alerts'].touch_all()
+            self.refresh.mark("expenses", "sips", "dashboard", "charts", "alerts")
+        if error is not None:
+            self.show_custom_message("ERROR", f"Failed to import: {str(error)}", "error")
+        elif not cancelled:
+            message = f"{job['imported']:,} rows imported successfully! 📥"
+            if job['bad']:
+                details = "\n".join(f"Line {line}: {reason}" for line, reason in job['bad_rows'])
+                message += f"\n{job['bad']:,} invalid rows skipped:\n{details}"
+            self.show_custom_message("SUCCESS" if not job['bad'] else "WARNING", message,
+                                     "success" if not job['bad'] else "warning")
+            self.refresh.mark("alerts")
 
     def change_theme(self, event=None):
         new_theme = self.theme_var.get().lower()
         if new_theme == self.current_theme:
             return
 
+        old_colors = self.colors
         self.current_theme = new_theme
         self.colors = self.themes[new_theme]
-        self.root.configure(bg=self.colors["background"])
-
-        frames = [
-            (self.login_frame, self.create_login_frame),
-            (self.nav_frame, self.create_nav_bar),
-            (self.main_frame, self.create_main_frame),
-            (self.add_expense_frame, self.create_add_expense_frame),
-            (self.view_expenses_frame, self.create_view_expenses_frame),
-            (self.stats_frame, self.create_stats_frame),
-            (self.settings_frame, self.create_settings_frame),
-            (self.sip_tracker_frame, self.create_sip_tracker_frame),
-            (self.view_sips_frame, self.create_view_sips_frame),  # Added
-            (self.budget_frame, self.create_budget_frame)
-        ]
-
-        current_frame = None
-        for frame, _ in frames:
-            if frame.winfo_ismapped():
-                current_frame = frame
-            frame.pack_forget()
-            frame.destroy()
-
-        for _, create_func in frames:
-            create_func()
-
+        self.restyle_widgets(self.root, old_colors)
         self.update_treeview_style()
-        self.update_chart_style()
-
-        if self.current_user:
-            self.nav_frame.pack(fill="x", side="top")
-            if current_frame == self.login_frame:
-                self.show_frame(self.main_frame)
-            else:
-                self.show_frame(next(f for f, _ in frames if f.winfo_ismapped() == current_frame) or self.main_frame)
+        if "stats" in self.frames:
+            self.update_chart_style()
+            edge = load_matplotlib().rcParams['axes.edgecolor']
+            for chart in self.stats_charts.values():
+                chart.restyle(self.colors["card"], edge, self.colors["text"])
+            self.charts_restyle = set(self.stats_charts)
+            self.refresh.mark("charts")
+
+    def theme_color_map(self, old_colors, roles):
+        # Palettes reuse values across roles (light card and button text are both white,
+        # light shadow and entry fields share a grey, primary and secondary swap between
+        # themes), so each option tries the roles it plausibly holds before the rest.
+        mapping = {}
+        for role in itertools.chain(roles, old_colors):
+            mapping.setdefault(old_colors[role].lower(), self.colors[role])
+        return mapping
+
+    def restyle_widgets(self, top, old_colors):
+        muted = self.lighten_color(old_colors["text"], 20)
+        foreground = self.theme_color_map(old_colors, ("text", "button_text"))
+        foreground.setdefault(muted, self.lighten_color(self.colors["text"], 20))
+        backgrounds = {
+            "Entry": self.theme_color_map(old_colors, ("entry", "card")),
+            "Button": self.theme_color_map(old_colors, ("secondary",)),
+            None: self.theme_color_map(old_colors, ("card", "background", "primary", "shadow"))
+        }
+        options = {"foreground": None, "activeforeground": None, "insertbackground": None,
+                   "background": backgrounds, "activebackground": backgrounds,
+                   "highlightbackground": backgrounds, "selectcolor": backgrounds}
+        stack = [top]
+        while stack:
+            widget = stack.pop()
+            stack.extend(widget.winfo_children())
+            if isinstance(widget, ttk.Widget):
+                continue
+            widget_class = widget.winfo_class()
+            changes = {}
+            for option in options.keys() & set(widget.keys()):
+                mapping = options[option]
+                if mapping is None:
+                    mapping = foreground
+                else:
+                    mapping = mapping.get(widget_class, mapping[None])
+                value = str(widget.cget(option)).lower()
+                if value in mapping:
+                    changes[option] = mapping[value]
+            if hasattr(widget, "base_bg"):
+                widget.base_bg = backgrounds["Button"].get(widget.base_bg.lower(), widget.base_bg)
+                changes["background"] = widget.base_bg
+                changes["activebackground"] = self.darken_color(widget.base_bg, 10)
+            if changes:
+                widget.configure(**changes)
+
+    def toggle_profiling(self):
+        if self.profile_var.get():
+            self.profiler.enable(self.profiler.path or PROFILE_LOG_FILE)
         else:
-            self.login_frame.pack(fill="both", expand=True)
-
-        self.update_dashboard()
-        self.update_expenses_table()
-        self.update_sip_table()
-        self.update_charts()
+            self.profiler.disable()
+
+    def reset_profiling(self):
+        self.profiler.reset()
+        self.update_perf_panel()
+
+    def update_perf_panel(self):
+        self.perf_tree.delete(*self.perf_tree.get_children())
+        for name, calls, rows, p50, p95 in self.profiler.summary():
+            self.perf_tree.insert("", "end", values=(name, f"{calls:,}", f"{rows:,}" if rows else "",
+                                                     f"{p50 * 1000:.2f} ms", f"{p95 * 1000:.2f} ms"))
+        counters = self.refresh.counters
+        self.perf_counters_label.config(
+            text=f"Refresh passes: {counters['passes']:,}, views refreshed: {counters['refreshed']:,}, "
+                 f"marks coalesced: {counters['coalesced']:,}, deferred: {counters['deferred']:,}")
 
     def switch_account(self):
         self.logout()
@@ -1315,31 +4226,74 @@ class ModernExpenseTracker:
                  foreground=[("selected", "white")])
 
     def update_chart_style(self):
-        plt.style.use('dark_background' if self.current_theme == "dark" else 'default')
-        plt.rcParams['axes.facecolor'] = self.colors["card"]
-        plt.rcParams['figure.facecolor'] = self.colors["card"]
-        plt.rcParams['axes.titlecolor'] = self.colors["text"]
-        plt.rcParams['axes.labelcolor'] = self.colors["text"]
-        plt.rcParams['xtick.color'] = self.colors["text"]
-        plt.rcParams['ytick.color'] = self.colors["text"]
-
-    def show_frame(self, frame):
-        frames = [self.main_frame, self.add_expense_frame, self.view_expenses_frame,
-                  self.stats_frame, self.settings_frame, self.sip_tracker_frame,
-                  self.view_sips_frame, self.budget_frame]  # Updated list
-        for f in frames:
-            f.pack_forget()
-        frame.pack(fill="both", expand=True)
-        if frame == self.view_expenses_frame:
-            self.update_expenses_table()
-        elif frame == self.stats_frame:
-            self.update_charts()
-        elif frame == self.view_sips_frame:  # Added
-            self.update_sip_table()
-        elif frame == self.main_frame:
-            self.update_dashboard()
+        mpl = load_matplotlib()
+        mpl.style.use('dark_background' if self.current_theme == "dark" else 'default')
+        mpl.rcParams['axes.facecolor'] = self.colors["card"]
+        mpl.rcParams['figure.facecolor'] = self.colors["card"]
+        mpl.rcParams['axes.titlecolor'] = self.colors["text"]
+        mpl.rcParams['axes.labelcolor'] = self.colors["text"]
+        mpl.rcParams['xtick.color'] = self.colors["text"]
+        mpl.rcParams['ytick.color'] = self.colors["text"]
+
+    def is_view_visible(self, view):
+        screen = self.view_screens[view]
+        return screen is None or screen == self.current_screen
+
+    def show_frame(self, name):
+        built = name not in self.frames
+        if built:
+            create, attribute = self.screens[name]
+            create()
+            self.frames[name] = getattr(self, attribute)
+        for other, frame in self.frames.items():
+            if other != name:
+                frame.pack_forget()
+        self.frames[name].pack(fill="both", expand=True)
+        self.current_screen = name
+        for view, screen in self.view_screens.items():
+            if screen == name:
+                self.refresh.refresh(view, force=built)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="TrackWise expense tracker")
+    parser.add_argument("--storage", choices=sorted(STORAGE_BACKENDS),
+                        default=os.environ.get("EXCHEQUER_STORAGE", "csv"))
+    parser.add_argument("--no-prewarm", action="store_true",
+                        help="load matplotlib only when Statistics is first opened")
+    parser.add_argument("--users-file", default="users.csv",
+                        help="accounts file used for login and by the batch commands")
+    parser.add_argument("--profile", metavar="PATH", default=os.environ.get("EXCHEQUER_PROFILE"),
+                        help="record handler and refresh timings: a Chrome trace if PATH ends in .json, "
+                             "otherwise a rotating log")
+    parser.add_argument("--cache-mb", type=int, default=USER_CACHE_BYTES >> 20,
+                        help="memory kept for the ledgers of recently logged-out users")
+    parser.add_argument("--stall-threshold", type=float, default=STALL_THRESHOLD_S, metavar="SECONDS",
+                        help=f"log the UI thread's stack to {STALL_LOG_FILE} when the mainloop is blocked "
+                             "this long; 0 disables the watchdog")
+    commands = parser.add_subparsers(dest="command", title="batch commands (run without one for the app)")
+    ingest_parser = commands.add_parser("ingest", help="bulk-import export CSV files into a user's ledger")
+    ingest_parser.add_argument("user")
+    ingest_parser.add_argument("files", nargs="+")
+    ingest_parser.add_argument("--replace", action="store_true", help="replace the ledger instead of merging")
+    rollup_parser = commands.add_parser("rollup", help="print month/category totals as CSV")
+    rollup_parser.add_argument("users", nargs="*", help="defaults to every user in the users file")
+    rollup_parser.add_argument("--month", help="only this YYYY-MM")
+    alerts_parser = commands.add_parser("alerts", help="print budget alerts as CSV")
+    alerts_parser.add_argument("users", nargs="*", help="defaults to every user in the users file")
+    alerts_parser.add_argument("--monthly-budget", type=float, default=0.0)
+    alerts_parser.add_argument("--daily-budget", type=float, default=0.0)
+    alerts_parser.add_argument("--date", help="evaluate as of this YYYY-MM-DD instead of today")
+    alerts_parser.add_argument("--fail-on-alert", action="store_true", help="exit with status 1 if any alert fired")
+    args = parser.parse_args()
+    if args.command:
+        try:
+            sys.exit(run_cli(args))
+        except BrokenPipeError:
+            # Output piped into head or similar; point stdout at devnull so the final flush is quiet.
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            sys.exit(1)
     root = tk.Tk()
-    app = ModernExpenseTracker(root)
+    app = ModernExpenseTracker(root, storage=args.storage, prewarm=not args.no_prewarm, profile=args.profile,
+                               stall_threshold=args.stall_threshold, cache_bytes=args.cache_mb << 20,
+                               users_file=args.users_file)
     root.mainloop()
\ No newline at end of file
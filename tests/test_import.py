@@ -0,0 +1,69 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+
+EXPENSE = {'date': "2024-03-01", 'category': "Food", 'amount': 12.5, 'description': "lunch"}
+SIP = {'name': "Index fund", 'amount': 500.0, 'category': "Equity", 'frequency': "Monthly",
+       'start_date': "2024-01-01"}
+
+
+class AbortImportTest(unittest.TestCase):
+    # Users below the compaction threshold have a journal but no snapshot files yet.
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.workdir = tempfile.TemporaryDirectory()
+        os.chdir(self.workdir.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.workdir.cleanup()
+
+    def journal_only_store(self, backend):
+        store = main.STORAGE_BACKENDS[backend]("journal")
+        store.load()
+        store.add_expense(EXPENSE)
+        store.add_sip(SIP)
+        self.assertFalse(os.path.exists(store.csv_file))
+        return store
+
+    def rows(self, store):
+        return ([(exp['id'], exp['description']) for exp in store.iter_expenses()],
+                [sip['id'] for sip in store.sips])
+
+    def test_abort_restores_a_ledger_without_snapshots(self):
+        for backend in ("csv", "binary"):
+            for merge in (True, False):
+                with self.subTest(backend=backend, merge=merge):
+                    store = self.journal_only_store(backend)
+                    before = self.rows(store)
+                    store.begin_import(merge)
+                    store.import_rows([dict(EXPENSE, id=7, description="imported")], [dict(SIP, id=9)],
+                                      remap=merge)
+                    store.abort_import()
+                    self.assertEqual(self.rows(store), before)
+                    self.assertEqual(store.aggregates.count, 1)
+                    store.close()
+                    for path in store._files():
+                        if os.path.exists(path):
+                            os.remove(path)
+
+    def test_failed_ingest_leaves_the_ledger_untouched(self):
+        store = self.journal_only_store("csv")
+        before = self.rows(store)
+        with open("import.csv", mode='w', newline='') as file:
+            file.write("ID,Type,Date,Category,Amount,Description,Frequency\n"
+                       "5,Expense,2024-02-01,Travel,30,imported,\n")
+        with self.assertRaises(FileNotFoundError):
+            main.LedgerEngine("csv").ingest("journal", ["import.csv", "missing.csv"])
+        reloaded = main.CsvLedgerStore("journal")
+        reloaded.load()
+        self.assertEqual(self.rows(reloaded), before)
+
+
+if __name__ == "__main__":
+    unittest.main()
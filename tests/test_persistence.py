@@ -0,0 +1,65 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+
+EXPENSE = {'date': "2024-03-01", 'category': "Food", 'amount': 12.5, 'description': "lunch"}
+
+
+class FlushRetryTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.workdir = tempfile.TemporaryDirectory()
+        os.chdir(self.workdir.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.workdir.cleanup()
+
+    def reloaded(self, store):
+        fresh = type(store)(store.username)
+        fresh.load()
+        return sorted((exp['id'], exp['description']) for exp in fresh.iter_expenses())
+
+    def test_failed_snapshot_is_retried_by_the_next_flush(self):
+        store = main.CsvLedgerStore("retry")
+        store.load()
+        store.add_expense(EXPENSE)
+        replace_file = main.replace_file
+        calls = []
+
+        def fail_once(*args, **kwargs):
+            calls.append(args[0])
+            if len(calls) == 1:
+                raise OSError("disk full")
+            return replace_file(*args, **kwargs)
+
+        with mock.patch.object(main, "replace_file", side_effect=fail_once):
+            with self.assertRaises(OSError):
+                store.save()
+            store.add_expense(dict(EXPENSE, description="dinner"))
+        self.assertEqual(self.reloaded(store), [(1, "lunch"), (2, "dinner")])
+        self.assertEqual(store.commits, 2)
+
+    def test_failed_journal_append_is_retried_ahead_of_newer_ops(self):
+        store = main.BinaryLedgerStore("journal")
+        store.load()
+        store.add_expense(EXPENSE)
+        append = main.LedgerJournal.append
+        with mock.patch.object(main.LedgerJournal, "append", side_effect=OSError("disk full"), autospec=True):
+            with self.assertRaises(OSError):
+                store.add_expense(dict(EXPENSE, description="dinner"))
+        with mock.patch.object(main.LedgerJournal, "append", autospec=True, side_effect=append) as retried:
+            store.remove_expenses([1])
+        ops = retried.call_args.args[1:]
+        self.assertEqual([op['op'] for op in ops], ['add', 'delete'])
+        self.assertEqual(self.reloaded(store), [(2, "dinner")])
+
+
+if __name__ == "__main__":
+    unittest.main()